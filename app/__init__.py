@@ -1,16 +1,44 @@
+import logging
+import os
 from flask import Flask
-from config import Config
-from flask_sqlalchemy import SQLAlchemy
+from config import PROFILES
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_bootstrap import Bootstrap
+from app.routing import RoutingSQLAlchemy, READ_BIND
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login = LoginManager(app)
-login.login_view = 'login'
-Bootstrap(app)
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+login = LoginManager()
+login.login_view = 'main.login'
+bootstrap = Bootstrap()
 
-from app import routes, models
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.from_object(config or PROFILES[os.environ.get('APP_PROFILE') or 'dev'])
+    logging.basicConfig(level=app.config['LOG_LEVEL'])
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login.init_app(app)
+    bootstrap.init_app(app)
+
+    from app.engine import init_engine
+    from app.routing import init_routing
+    init_engine(app, db.get_engine(app))
+    if READ_BIND in app.config['SQLALCHEMY_BINDS']:
+        init_engine(app, db.get_engine(app, READ_BIND), app.config['SQLITE_READ_PRAGMAS'])
+    init_routing(app)
+
+    from app import routes, api, cli, metrics
+    app.register_blueprint(routes.bp)
+    app.register_blueprint(api.bp)
+    app.register_blueprint(cli.bp)
+    app.register_blueprint(metrics.bp)
+
+    # Flask-Admin builds forms for every view up front, workers and commands that
+    # never serve /admin can skip it
+    if app.config['ADMIN_ENABLED']:
+        from app.admin import init_admin
+        init_admin(app)
+    return app
@@ -0,0 +1,119 @@
+from flask import g, flash, redirect, url_for
+from flask_login import current_user
+from flask_admin import expose, AdminIndexView, Admin
+from flask_admin.contrib.sqla import ModelView
+from app import db
+from app.models import User, Role, Cartridge, Printer, Office, CartridgeStock, PrinterStock, StockAlert
+
+
+class MyAdminIndexView(AdminIndexView):
+    @expose('/')
+    def index(self):
+        if current_user.is_authenticated:
+            if not current_user.has_role('Admin'):
+                flash('You do not have enough permissons for opening this page.')
+                return redirect(url_for('main.index'))
+            return super(MyAdminIndexView, self).index()
+        else:
+            return redirect(url_for('main.index'))
+
+
+def date_formatter(view, context, model, name):
+    return model.date.strftime('%d.%m.%Y %H:%M:%S')
+
+
+def lookup_formatter(view, context, model, name):
+    return view.lookup(name, getattr(model, name))
+
+
+class LookupModelView(ModelView):
+    # column -> (model, attribute shown instead of the foreign key)
+    column_lookups = {}
+
+    def resolve(self, column, ids):
+        model, attribute = self.column_lookups[column]
+        ids = set(ids) - {None}
+        if not ids:
+            return {}
+        return dict(db.session.query(model.id, getattr(model, attribute)).filter(model.id.in_(ids)))
+
+    def lookup(self, column, value):
+        lookups = g.setdefault('admin_lookups', {}).setdefault(column, {})
+        if value not in lookups:
+            lookups.update(self.resolve(column, [value]))
+        return lookups.get(value, value)
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        result = super(LookupModelView, self).get_list(page, sort_column, sort_desc, search, filters,
+                                                       execute=execute, page_size=page_size)
+        if execute:
+            lookups = g.setdefault('admin_lookups', {})
+            for column in self.column_lookups:
+                lookups.setdefault(column, {}).update(self.resolve(column, [getattr(row, column) for row in result[1]]))
+        return result
+
+
+class RoleView(ModelView):
+    pass
+
+
+class UserView(ModelView):
+    can_create=False
+    column_list = ['username', 'email', 'roles']
+
+    def get_query(self):
+        return super(UserView, self).get_query().options(db.selectinload(User.roles))
+
+
+class CartridgeView(ModelView):
+    can_create = False
+
+
+class PrinterView(ModelView):
+    can_create = False
+
+
+class OfficeView(ModelView):
+    can_create = False
+
+
+class CartridgeStockView(LookupModelView):
+    can_create = False
+    column_hide_backrefs = False
+    column_list = [CartridgeStock.date, CartridgeStock.in_out, CartridgeStock.office, CartridgeStock.item_id, CartridgeStock.amount]
+    column_labels = {'item_id': 'Cartridge'}
+    column_formatters = {'date': date_formatter, 'office': lookup_formatter, 'item_id': lookup_formatter}
+    column_lookups = {'office': (Office, 'name'), 'item_id': (Cartridge, 'cartridge_model')}
+    # the item type is fixed by the view, the item is edited through its synonym and
+    # the ledger sequence belongs to the transaction that wrote the row
+    form_excluded_columns = ['item_type', 'item_id', 'sequence']
+
+
+class PrinterStockView(LookupModelView):
+    can_create = False
+    column_list = [PrinterStock.date, PrinterStock.in_out, PrinterStock.office, PrinterStock.item_id, PrinterStock.amount]
+    column_labels = {'item_id': 'Printer'}
+    column_formatters = {'date': date_formatter, 'office': lookup_formatter, 'item_id': lookup_formatter}
+    column_lookups = {'office': (Office, 'name'), 'item_id': (Printer, 'printer_model')}
+    form_excluded_columns = ['item_type', 'item_id', 'sequence']
+
+
+class StockAlertView(ModelView):
+    can_create = False
+    can_edit = False
+    column_default_sort = ('date', True)
+    column_filters = ['item_type', 'level']
+    column_formatters = {'date': date_formatter}
+
+
+def init_admin(app):
+    admin = Admin(app, name='IT Store', index_view=MyAdminIndexView(), template_mode='bootstrap3')
+    admin.add_view(UserView(User, db.session))
+    admin.add_view(RoleView(Role, db.session))
+    admin.add_view(CartridgeView(Cartridge, db.session))
+    admin.add_view(PrinterView(Printer, db.session))
+    admin.add_view(OfficeView(Office, db.session))
+    admin.add_view(CartridgeStockView(CartridgeStock, db.session))
+    admin.add_view(PrinterStockView(PrinterStock, db.session))
+    admin.add_view(StockAlertView(StockAlert, db.session))
+    return admin
@@ -0,0 +1,82 @@
+import json
+import logging
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.models import Cartridge, Printer, CartridgeBalance, PrinterBalance, StockAlert
+
+logger = logging.getLogger(__name__)
+
+# balance model -> (catalog model, item column which is also the key in STOCK_LEVELS)
+LEVELS = {
+    CartridgeBalance: (Cartridge, 'cartridge'),
+    PrinterBalance: (Printer, 'printer'),
+}
+OK, LOW, CRITICAL = 'ok', 'low', 'critical'
+
+
+def stock_level(amount, warning_level, critical_level, item_type):
+    default_warning, default_critical = current_app.config['STOCK_LEVELS'][item_type]
+    if amount < (default_critical if critical_level is None else critical_level):
+        return CRITICAL
+    if amount <= (default_warning if warning_level is None else warning_level):
+        return LOW
+    return OK
+
+
+def check_levels(session, changes):
+    # changes: {(balance model, item id): delta} for the warehouse rows just updated.
+    # Only these items are looked at; a level change is stored as an alert in the same
+    # transaction and handed to the sinks once it commits.
+    alerts = []
+    for balance, (model, item_type) in LEVELS.items():
+        deltas = {item: delta for (changed, item), delta in changes.items() if changed is balance and delta}
+        if not deltas:
+            continue
+        item_column = getattr(balance, item_type)
+        rows = session.query(model.id, balance.amount, model.warning_level, model.critical_level) \
+            .outerjoin(balance, db.and_(item_column == model.id,
+                                        balance.office == current_app.config['WAREHOUSE_OFFICE_ID'])) \
+            .filter(model.id.in_(deltas))
+        for item, amount, warning_level, critical_level in rows:
+            amount = amount or 0
+            previous = stock_level(amount - deltas[item], warning_level, critical_level, item_type)
+            level = stock_level(amount, warning_level, critical_level, item_type)
+            if previous != level:
+                alerts.append({'date': datetime.now(), 'item_type': item_type, 'item': item,
+                               'previous_level': previous, 'level': level, 'amount': amount})
+    if alerts:
+        session.execute(StockAlert.__table__.insert(), alerts)
+        session.info.setdefault('stock_alerts', []).extend(alerts)
+
+
+def log_sink(alert):
+    log = logger.warning if alert['level'] != OK else logger.info
+    log('%s %s stock went from %s to %s: %s left', alert['item_type'], alert['item'], alert['previous_level'],
+        alert['level'], alert['amount'])
+
+
+def file_sink(alert):
+    path = current_app.config.get('STOCK_ALERT_FILE')
+    if path:
+        with open(path, 'a') as sink:
+            sink.write(json.dumps(dict(alert, date=alert['date'].isoformat())) + '\n')
+
+
+ALERT_SINKS = [log_sink, file_sink]
+
+
+@event.listens_for(db.session, 'after_commit')
+def notify(session):
+    for alert in session.info.pop('stock_alerts', []):
+        for sink in ALERT_SINKS:
+            try:
+                sink(alert)
+            except Exception:
+                logger.exception('Stock alert sink %r failed', sink)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def discard(session, previous_transaction):
+    session.info.pop('stock_alerts', None)
@@ -0,0 +1,82 @@
+import math
+import threading
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from app import db
+from app.models import CartridgeStock, CartridgeBalance, LedgerVersion
+from app.catalog import catalog
+from app.stock import warehouse_levels
+
+Consumption = namedtuple('Consumption', 'office cartridge totals rate')
+Forecast = namedtuple('Forecast', 'cartridge on_hand totals rate days_left reorder')
+
+_lock = threading.Lock()
+_state = {'revision': None, 'last_sequence': 0, 'daily': None}
+
+
+def ledger_revision():
+    return db.session.query(LedgerVersion.generation).filter_by(id=1).scalar() or 0
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def daily_issues(since):
+    # (office, cartridge) -> {day: amount issued}, summed by the database one day at a time.
+    # Only rows committed after the previous call are read, by ledger sequence: ids can
+    # commit out of order. Edits and deletes bump the ledger revision and start the
+    # buckets over.
+    global _state
+    revision = ledger_revision()
+    with _lock:
+        if _state['revision'] != revision:
+            _state = {'revision': revision, 'last_sequence': 0, 'daily': defaultdict(lambda: defaultdict(int))}
+        day = db.func.date(CartridgeStock.date)
+        rows = db.session.query(CartridgeStock.office, CartridgeStock.cartridge, day,
+                                db.func.sum(CartridgeStock.amount), db.func.max(CartridgeStock.sequence)) \
+            .filter(CartridgeStock.in_out == False, CartridgeStock.sequence > _state['last_sequence'],
+                    CartridgeStock.date >= datetime.combine(since, time.min)) \
+            .group_by(CartridgeStock.office, CartridgeStock.cartridge, day)
+        daily = _state['daily']
+        for office, cartridge, issued_on, amount, last_sequence in rows:
+            daily[(office, cartridge)][_as_date(issued_on)] += amount or 0
+            _state['last_sequence'] = max(_state['last_sequence'], last_sequence)
+        for days in daily.values():
+            for old in [issued_on for issued_on in days if issued_on < since]:
+                del days[old]
+        return {key: dict(days) for key, days in daily.items()}
+
+
+def office_consumption(today=None):
+    today = today or date.today()
+    windows = current_app.config['CONSUMPTION_WINDOWS']
+    forecast_window = current_app.config['FORECAST_WINDOW']
+    starts = {window: today - timedelta(days=window - 1) for window in set(windows) | {forecast_window}}
+    result = []
+    for (office, cartridge), days in daily_issues(min(starts.values())).items():
+        totals = {window: sum(amount for issued_on, amount in days.items() if issued_on >= start)
+                  for window, start in starts.items()}
+        result.append(Consumption(office, cartridge, totals, totals[forecast_window] / float(forecast_window)))
+    return result
+
+
+def reorder_forecast(today=None):
+    config = current_app.config
+    consumption = office_consumption(today)
+    totals, rates = defaultdict(lambda: defaultdict(int)), defaultdict(float)
+    for row in consumption:
+        for window, amount in row.totals.items():
+            totals[row.cartridge][window] += amount
+        rates[row.cartridge] += row.rate
+    items = catalog('cartridge')
+    on_hand = warehouse_levels(CartridgeBalance, [item.id for item in items])
+    horizon = config['REORDER_LEAD_DAYS'] + config['REORDER_COVER_DAYS']
+    forecast = []
+    for item in items:
+        stock, rate = on_hand.get(item.id, 0), rates[item.id]
+        days_left = max(0, int(stock / rate)) if rate else None
+        reorder = max(0, int(math.ceil(rate * horizon)) - stock)
+        forecast.append(Forecast(item, stock, dict(totals[item.id]), rate, days_left, reorder))
+    return sorted(forecast, key=lambda row: (row.days_left is None, row.days_left, row.cartridge.label)), consumption
@@ -0,0 +1,144 @@
+import gzip
+import json
+from datetime import date, datetime
+from flask import Blueprint, request, jsonify, abort, current_app, Response
+from flask_login import current_user, login_required
+from werkzeug.http import is_resource_modified
+from app.catalog import catalog
+from app.ledger import LEDGER_TABLES, movements_page, stock_balances, ledger_id_page
+from app.stock import LEDGERS, record_movements, warehouse_id
+from app.snapshots import balances_as_of
+from app.dashboard import dashboard_state, dashboard_etag
+from app.live import live_feed
+
+bp = Blueprint('api', __name__)
+# v1 encoding: rows are arrays in the order of "fields", dates are YYYYMMDDHHMMSS in
+# the store's local time, directions are 1 for in and 0 for out
+API_VERSION = 1
+API_DATE_FORMAT = '%Y%m%d%H%M%S'
+
+
+@bp.route('/api/movements', methods=['POST'])
+@login_required
+def post_movements():
+    payload = request.get_json(silent=True)
+    lines = payload.get('movements') if isinstance(payload, dict) else None
+    if not isinstance(lines, list) or not lines:
+        return jsonify(error='Expected a JSON object with a non-empty "movements" list.'), 400
+    if len(lines) > current_app.config['STOCK_BATCH_LIMIT']:
+        return jsonify(error='At most {} movements per request.'.format(current_app.config['STOCK_BATCH_LIMIT'])), 400
+    results = record_movements(lines, current_user.id)
+    live_feed.publish()
+    return jsonify(recorded=sum(result['status'] == 'ok' for result in results), results=results)
+
+
+@bp.route('/api/movements')
+@login_required
+def list_movements():
+    # cartridges and printers together, newest first; ?office=&date_from=&date_to=&after=
+    try:
+        dates = {key: datetime.strptime(request.args[key], '%Y-%m-%d').date()
+                 for key in ('date_from', 'date_to') if key in request.args}
+    except ValueError:
+        return jsonify(error='"date_from" and "date_to" must look like YYYY-MM-DD.'), 400
+    rows, next_cursor = movements_page(request.args.get('after'), current_app.config['LEDGER_PAGE_SIZE'],
+                                       office=request.args.get('office', type=int), **dates)
+    return jsonify(next=next_cursor, movements=[
+        {'id': row.id, 'date': row.date.isoformat(), 'item_type': row.item_type, 'item_id': row.item_id,
+         'item': row.item, 'office': row.office, 'place': row.place, 'in_out': row.in_out, 'amount': row.amount}
+        for row in rows])
+
+
+def api_etag(state):
+    # Polling clients revalidate with If-None-Match; the tag moves with every ledger or
+    # catalog change. It differs per encoding, as the gzipped body is another representation.
+    encoding = 'gzip' if 'gzip' in request.accept_encodings else 'identity'
+    return dashboard_etag(state, None, '{} {}'.format(request.full_path, encoding))
+
+
+def compact_response(payload, etag):
+    if payload is None:
+        response = Response(status=304)
+    else:
+        body = json.dumps(dict(payload, v=API_VERSION), separators=(',', ':')).encode('utf-8')
+        response = Response(body, mimetype='application/json')
+        if 'gzip' in request.accept_encodings and len(body) >= current_app.config['API_GZIP_MIN_SIZE']:
+            response.set_data(gzip.compress(body, current_app.config['API_GZIP_LEVEL']))
+            response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.set_etag(etag)
+    return response
+
+
+def ledger_model(ledger):
+    model = LEDGER_TABLES.get(ledger)
+    if model is None:
+        abort(404)
+    return model
+
+
+@bp.route('/api/v1/balances/<ledger>')
+@login_required
+def balances_v1(ledger):
+    model = ledger_model(ledger)
+    etag = api_etag(dashboard_state())
+    if not is_resource_modified(request.environ, etag=etag):
+        return compact_response(None, etag)
+    office = request.args.get('office', warehouse_id(), type=int)
+    return compact_response({'ledger': ledger, 'office': office, 'fields': ['id', 'model', 'amount', 'level'],
+                             'rows': [list(row) for row in stock_balances(model, office)]}, etag)
+
+
+@bp.route('/api/v1/ledger/<ledger>')
+@login_required
+def ledger_v1(ledger):
+    # ?after=<cursor>&limit=&office=&item=&in_out=in|out&date_from=&date_to=, newest first
+    model = ledger_model(ledger)
+    try:
+        filters = {key: datetime.strptime(request.args[key], '%Y-%m-%d').date()
+                   for key in ('date_from', 'date_to') if key in request.args}
+    except ValueError:
+        return jsonify(error='"date_from" and "date_to" must look like YYYY-MM-DD.'), 400
+    if request.args.get('in_out') not in (None, 'in', 'out'):
+        return jsonify(error='"in_out" must be "in" or "out".'), 400
+    filters.update(office=request.args.get('office', type=int), item=request.args.get('item', type=int),
+                   in_out={'in': True, 'out': False}.get(request.args.get('in_out')))
+    limit = min(request.args.get('limit', current_app.config['LEDGER_PAGE_SIZE'], type=int),
+                current_app.config['API_PAGE_LIMIT'])
+    if limit < 1:
+        return jsonify(error='"limit" must be a positive integer.'), 400
+    etag = api_etag(dashboard_state())
+    if not is_resource_modified(request.environ, etag=etag):
+        return compact_response(None, etag)
+    rows, next_cursor = ledger_id_page(model, request.args.get('after'), limit, **filters)
+    offices = {item.id: item.label for item in catalog('office')}
+    items = {item.id: item.label for item in catalog(LEDGERS[model][1])}
+    return compact_response({
+        'ledger': ledger, 'next': next_cursor,
+        'fields': ['id', 'date', 'office', 'item', 'in_out', 'amount'],
+        'rows': [[row.id, row.date and row.date.strftime(API_DATE_FORMAT), row.office, row.item_id,
+                  None if row.in_out is None else int(row.in_out), row.amount] for row in rows],
+        # names of the ids on this page only
+        'offices': {office: offices.get(office) for office in {row.office for row in rows} if office is not None},
+        'items': {item: items.get(item) for item in {row.item_id for row in rows} if item is not None},
+    }, etag)
+
+
+@bp.route('/api/balances/<ledger>')
+@login_required
+def balances_on_date(ledger):
+    model = LEDGER_TABLES.get(ledger)
+    if model is None:
+        abort(404)
+    try:
+        day = datetime.strptime(request.args['date'], '%Y-%m-%d').date() if 'date' in request.args else date.today()
+    except ValueError:
+        return jsonify(error='"date" must look like YYYY-MM-DD.'), 400
+    office = request.args.get('office', warehouse_id(), type=int)
+    item_key = LEDGERS[model][1]
+    totals = balances_as_of(model, day)
+    return jsonify(date=day.isoformat(), office=office, balances=[
+        {item_key: item.id, 'model': item.label, 'amount': totals.get((item.id, office), 0)}
+        for item in catalog(item_key)])
@@ -0,0 +1,59 @@
+from datetime import datetime
+from sqlalchemy import func
+from app import db
+from app.models import StockMovement, LedgerArchive, LedgerVersion, bump_version
+from app.stock import LEDGERS, LEDGER_NAMES, OPENINGS, archive_table, archive_cutoff, ledger_balances
+
+
+def _record_archive(ledger, year, rows):
+    archive = LedgerArchive.query.filter_by(ledger=ledger, year=year).first()
+    if archive is None:
+        archive = LedgerArchive(ledger=ledger, year=year, rows=0)
+        db.session.add(archive)
+    archive.rows += rows
+    archive.updated = datetime.now()
+
+
+def archive_ledger(model, cutoff):
+    # Moves every movement dated before `cutoff` into the archive table of its year and
+    # folds it into the opening balances, so balances summed from the hot table stay exact.
+    table = StockMovement.__table__
+    opening = OPENINGS[model]
+    item_key = LEDGERS[model][1]
+    movements = db.and_(table.c.item_type == item_key, table.c.date < cutoff)
+    first = db.session.query(func.min(model.date)).filter(model.date < cutoff).scalar()
+    if first is None:
+        return 0
+    openings = ledger_balances(model, until=cutoff)
+    moved = 0
+    for year in range(first.year, cutoff.year + 1):
+        start, end = datetime(year, 1, 1), min(datetime(year + 1, 1, 1), cutoff)
+        if db.session.query(model.id).filter(model.date >= start, model.date < end).first() is None:
+            continue
+        archive = archive_table(model, year)
+        archive.create(db.session.connection(), checkfirst=True)
+        columns = [column.name for column in archive.columns]
+        selected = [table.c.item_id if name == item_key else table.c[name] for name in columns]
+        rows = db.session.execute(archive.insert().from_select(
+            columns, db.select(selected).where(movements).where(table.c.date >= start).where(table.c.date < end))).rowcount
+        _record_archive(LEDGER_NAMES[model], year, rows)
+        moved += rows
+    db.session.execute(table.delete().where(movements))
+    db.session.execute(opening.__table__.delete())
+    db.session.execute(opening.__table__.insert(), [
+        {'date': cutoff, item_key: item, 'office': office, 'amount': amount}
+        for (item, office), amount in sorted(openings.items())])
+    return moved
+
+
+def archive_ledgers(cutoff):
+    for model in OPENINGS:
+        previous = archive_cutoff(model)
+        if previous is not None and cutoff < previous:
+            raise ValueError('{} is already archived up to {}.'.format(LEDGER_NAMES[model], previous.date()))
+    moved = {LEDGER_NAMES[model]: archive_ledger(model, cutoff) for model in OPENINGS}
+    if any(moved.values()):
+        # cached dashboard pages and consumption buckets still hold the moved rows
+        bump_version(db.session, LedgerVersion)
+    db.session.commit()
+    return moved
@@ -0,0 +1,76 @@
+import threading
+from collections import namedtuple
+from flask import g
+from sqlalchemy import event
+from app import db
+from app.models import Cartridge, Printer, Office, CatalogVersion, cartridges, printers, bump_version
+
+CatalogItem = namedtuple('CatalogItem', 'id label')
+
+CATALOGS = {
+    'cartridge': Cartridge,
+    'printer': Printer,
+    'office': Office,
+}
+CATALOG_MODELS = tuple(CATALOGS.values())
+
+_lock = threading.Lock()
+_cache = {'generation': None, 'catalogs': {}}
+
+
+def current_generation():
+    # one primary key lookup per request, shared by every field and process
+    if 'catalog_generation' not in g:
+        g.catalog_generation = db.session.query(CatalogVersion.generation).filter_by(id=1).scalar() or 0
+    return g.catalog_generation
+
+
+def bump_generation(session):
+    bump_version(session, CatalogVersion)
+    g.pop('catalog_generation', None)
+
+
+def cached(name, loader):
+    global _cache
+    generation = current_generation()
+    with _lock:
+        if _cache['generation'] != generation:
+            _cache = {'generation': generation, 'catalogs': {}}
+        catalogs = _cache['catalogs']
+    if name not in catalogs:
+        catalogs[name] = loader()
+    return catalogs[name]
+
+
+def catalog(name):
+    model = CATALOGS[name]
+    return cached(name, lambda: [CatalogItem(obj.id, str(obj)) for obj in model.query.order_by(model.id)])
+
+
+def load_compatibility():
+    compatibility = {}
+    rows = db.session.query(printers.c.office_id, cartridges.c.cartridge_id) \
+        .join(cartridges, cartridges.c.printer_id == printers.c.printer_id).distinct()
+    for office, cartridge in rows:
+        compatibility.setdefault(office, set()).add(cartridge)
+    return {office: frozenset(ids) for office, ids in compatibility.items()}
+
+
+def compatible_cartridges(office):
+    return cached('compatibility', load_compatibility).get(office, frozenset())
+
+
+def cartridge_choices(office, in_out):
+    # any model can be received into stock, but only compatible ones can be issued to an office
+    if in_out:
+        return catalog('cartridge')
+    compatible = compatible_cartridges(office)
+    return [item for item in catalog('cartridge') if item.id in compatible]
+
+
+@event.listens_for(db.session, 'after_flush')
+def invalidate_catalogs(session, flush_context):
+    changed = [obj for obj in session.new | session.deleted if isinstance(obj, CATALOG_MODELS)]
+    changed += [obj for obj in session.dirty if isinstance(obj, CATALOG_MODELS) and session.is_modified(obj)]
+    if changed:
+        bump_generation(session)
@@ -0,0 +1,133 @@
+from datetime import date, datetime, timedelta
+import click
+from flask import Blueprint, current_app
+from app.stock import rebuild_balances, verify_balances, archived_years
+from app.ledger import LEDGER_TABLES
+from app.export import export_chunks, EXPORT_FORMATS
+from app.imports import read_catalog, import_catalog, SECTIONS
+from app.snapshots import create_checkpoint, create_monthly_checkpoints
+from app.archive import archive_ledgers
+from app.models import LedgerArchive
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+@bp.cli.group()
+def balances():
+    """Maintain the stock balance tables."""
+
+
+@balances.command()
+def rebuild():
+    """Recompute all stock balances from the ledgers."""
+    rebuild_balances()
+    click.echo('Stock balances rebuilt.')
+
+
+@balances.command()
+@click.pass_context
+def verify(ctx):
+    """Compare stored stock balances with the ledgers."""
+    mismatches = verify_balances()
+    for table, item, office, expected, stored in mismatches:
+        click.echo('{}: item {} at office {} should be {}, stored {}'.format(table, item, office, expected, stored))
+    if mismatches:
+        ctx.exit(1)
+    click.echo('Stock balances match the ledgers.')
+
+
+@bp.cli.command()
+@click.argument('ledger', type=click.Choice(sorted(LEDGER_TABLES)))
+@click.option('--format', 'format', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv')
+@click.option('--date-from', type=click.DateTime(formats=['%Y-%m-%d']))
+@click.option('--date-to', type=click.DateTime(formats=['%Y-%m-%d']))
+@click.option('--office', type=int, help='Only movements of this office id.')
+@click.option('--archive', 'year', type=int, help='Export the archived movements of this year.')
+@click.option('--output', type=click.File('w'), default='-')
+def export(ledger, format, date_from, date_to, office, year, output):
+    """Stream a stock ledger as CSV or JSON lines."""
+    model = LEDGER_TABLES[ledger]
+    if year is not None and year not in archived_years(model):
+        raise click.BadParameter('{} has no archive for {}.'.format(ledger, year), param_hint='--archive')
+    for chunk in export_chunks(model, format, current_app.config['EXPORT_CHUNK_SIZE'], year,
+                               date_from=date_from and date_from.date(), date_to=date_to and date_to.date(),
+                               office=office):
+        output.write(chunk)
+
+
+@bp.cli.command('import-catalog')
+@click.argument('file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--section', type=click.Choice(sorted(SECTIONS)), help='Catalog section held by a CSV file.')
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+@click.pass_context
+def import_catalog_command(ctx, file, section, dry_run):
+    """Upsert cartridges, printers, offices and their links from JSON or CSV."""
+    try:
+        data = read_catalog(file, 'json' if file.name.lower().endswith('.json') else 'csv', section)
+    except ValueError as error:
+        raise click.ClickException('Could not read {}: {}'.format(file.name, error))
+    report = import_catalog(data, dry_run=dry_run)
+    for line in report.lines():
+        click.echo(line)
+    if report.errors:
+        ctx.exit(1)
+
+
+@bp.cli.group()
+def snapshots():
+    """Balance checkpoints used by historical balance queries."""
+
+
+@snapshots.command()
+@click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Closing day of the checkpoint, the end of last month by default.')
+def create(day):
+    """Store the closing balances of one day."""
+    day = day.date() if day else date.today().replace(day=1) - timedelta(days=1)
+    if day >= date.today():
+        raise click.BadParameter('Checkpoints can only be taken for days that are over.', param_hint='--date')
+    create_checkpoint(day)
+    click.echo('Checkpoint {} created.'.format(day))
+
+
+@snapshots.command()
+def monthly():
+    """Create every missing month-end checkpoint; meant to run from cron."""
+    for checkpoint in create_monthly_checkpoints(date.today() - timedelta(days=1)):
+        click.echo('Checkpoint {} created.'.format(checkpoint.date))
+
+
+@bp.cli.group()
+def archive():
+    """Move old ledger movements into yearly archive tables."""
+
+
+@archive.command('run')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive movements dated before this day.')
+@click.option('--keep-days', type=int, help='Days of movements to keep, LEDGER_RETENTION_DAYS by default.')
+def archive_run(before, keep_days):
+    """Archive old movements and carry them as opening balances."""
+    if before is not None and keep_days is not None:
+        raise click.UsageError('Use either --before or --keep-days.')
+    if before is None:
+        before = date.today() - timedelta(days=keep_days or current_app.config['LEDGER_RETENTION_DAYS'])
+    cutoff = datetime.combine(before, datetime.min.time())
+    # consumption statistics and the forecast read raw movements of their windows
+    window = max(current_app.config['CONSUMPTION_WINDOWS'] + (current_app.config['FORECAST_WINDOW'],))
+    if cutoff.date() > date.today() - timedelta(days=window):
+        raise click.BadParameter('Movements of the last {} days are needed by the analytics.'.format(window))
+    try:
+        moved = archive_ledgers(cutoff)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    for ledger, rows in sorted(moved.items()):
+        click.echo('{}: {} movements archived before {}.'.format(ledger, rows, cutoff.date()))
+
+
+@archive.command('list')
+def archive_list():
+    """Show the archived years of every ledger."""
+    for item in LedgerArchive.query.order_by(LedgerArchive.ledger, LedgerArchive.year):
+        click.echo('{} {}: {} movements, updated {:%Y-%m-%d %H:%M}'.format(item.ledger, item.year, item.rows,
+                                                                          item.updated))
@@ -0,0 +1,46 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from flask import current_app
+from markupsafe import Markup
+from app import db
+from app.models import LedgerVersion, LedgerSequence
+from app.catalog import current_generation
+
+DashboardState = namedtuple('DashboardState', 'high_water ledger_generation catalog_generation')
+
+_lock = threading.Lock()
+_cache = {'state': None, 'fragments': OrderedDict()}
+
+
+def dashboard_state():
+    # one round trip: appends move the ledger sequence, edits and deletes bump the ledger
+    # version. Unlike max(id), the sequence cannot miss a row that commits late.
+    high_water, generation = db.session.query(
+        db.select([LedgerSequence.generation]).where(LedgerSequence.id == 1).as_scalar(),
+        db.select([LedgerVersion.generation]).where(LedgerVersion.id == 1).as_scalar()).one()
+    return DashboardState(high_water or 0, generation or 0, current_generation())
+
+
+def dashboard_etag(state, user_id, query_string):
+    key = repr((state.high_water, state.ledger_generation, state.catalog_generation, user_id, query_string))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def cached_fragment(state, key, render):
+    # rendered fragments are only reused while the ledgers and catalogs stay as they were
+    global _cache
+    with _lock:
+        if _cache['state'] != state:
+            _cache = {'state': state, 'fragments': OrderedDict()}
+        fragments = _cache['fragments']
+        if key in fragments:
+            fragments.move_to_end(key)
+            return fragments[key]
+    html = Markup(render())
+    with _lock:
+        if _cache['state'] == state:
+            fragments[key] = html
+            while len(fragments) > current_app.config['FRAGMENT_CACHE_SIZE']:
+                fragments.popitem(last=False)
+    return html
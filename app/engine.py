@@ -0,0 +1,34 @@
+import logging
+import random
+import sqlite3
+import time
+from sqlalchemy import event
+
+logger = logging.getLogger('app.sql')
+
+
+def init_engine(app, engine, pragmas=None):
+    pragmas = app.config['SQLITE_PRAGMAS'] if pragmas is None else pragmas
+    slow = app.config['SQL_SLOW_QUERY_SECONDS']
+    sample_rate = app.config['SQL_LOG_SAMPLE_RATE']
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        cursor.close()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def log_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if elapsed >= slow:
+            logger.warning('Slow query (%.3fs): %s %r', elapsed, statement, parameters)
+        elif sample_rate and random.random() < sample_rate:
+            logger.debug('Query (%.3fs): %s %r', elapsed, statement, parameters)
@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+from app.models import User
+from app.ledger import ledger_query, filter_ledger
+from app.stock import LEDGERS, archive_table
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def export_fields(model):
+    return ['id', 'date', 'place', 'office', LEDGERS[model][1], 'user', 'direction', 'amount']
+
+
+def export_rows(model, chunk_size=1000, year=None, **filters):
+    # stream_results asks the driver for a server-side cursor, yield_per keeps only one
+    # chunk of rows in memory at a time
+    source = model if year is None else archive_table(model, year).c
+    query = filter_ledger(ledger_query(model, source), model, source=source, **filters) \
+        .add_columns(User.username.label('user')) \
+        .outerjoin(User, User.id == source.user_id) \
+        .order_by(source.date, source.id) \
+        .execution_options(stream_results=True) \
+        .yield_per(chunk_size)
+    item_key = LEDGERS[model][1]
+    for row in query:
+        yield [row.id, row.date.isoformat() if row.date else None, row.place, row.office, getattr(row, item_key),
+               row.user, None if row.in_out is None else ('In' if row.in_out else 'Out'), row.amount]
+
+
+def export_chunks(model, format, chunk_size=1000, year=None, **filters):
+    fields = export_fields(model)
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        write = writer.writerow
+    else:
+        write = lambda values: buffer.write(json.dumps(dict(zip(fields, values))) + '\n')
+    for count, values in enumerate(export_rows(model, chunk_size, year, **filters), 1):
+        write(values)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -1,20 +1,31 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import SelectField, StringField, BooleanField, SubmitField, FieldList, PasswordField, IntegerField
+from wtforms.fields.html5 import DateField
 from wtforms.ext.sqlalchemy.fields import QuerySelectField
 from wtforms.validators import DataRequired, Required, Email, EqualTo, Optional, NumberRange, InputRequired, ValidationError
-from app.models import User, Cartridge, Printer, Office, CartridgeStock, PrinterStock
+from operator import attrgetter
+from app.models import User
+from app.catalog import catalog
 
 
 def cartridgeChoice():
-    return Cartridge.query.all()
+    return catalog('cartridge')
 
 
 def printerChoice():
-    return Printer.query.all()
+    return catalog('printer')
 
 
 def officeChoice():
-    return Office.query.all()
+    return catalog('office')
+
+
+class CatalogSelectField(QuerySelectField):
+    def __init__(self, label=None, validators=None, **kwargs):
+        kwargs.setdefault('get_pk', attrgetter('id'))
+        kwargs.setdefault('get_label', 'label')
+        super(CatalogSelectField, self).__init__(label, validators, **kwargs)
 """
 def printerInOffice(office):
     printers = []
@@ -44,33 +55,52 @@ class AddCartridgeForm(FlaskForm):
 class AddPrinterForm(FlaskForm):
     brand = StringField('Brand', validators=[DataRequired()])
     printer_model = StringField('Model', validators=[DataRequired()])
-    cartridges = FieldList(QuerySelectField('Compatible cartridge', validators=[Required()], query_factory=cartridgeChoice), min_entries=1, max_entries=4)
+    cartridges = FieldList(CatalogSelectField('Compatible cartridge', validators=[Required()], query_factory=cartridgeChoice), min_entries=1, max_entries=4)
     submit = SubmitField('Add Data')
 
 
 class AddOfficeForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     place = StringField('Place', validators=[DataRequired()])
-    printers = FieldList(QuerySelectField('Printer', validators=[InputRequired()], query_factory=printerChoice), min_entries=1)
+    printers = FieldList(CatalogSelectField('Printer', validators=[InputRequired()], query_factory=printerChoice), min_entries=1)
     submit = SubmitField('Add Data')
 
 
-class CartridgeStockForm(FlaskForm):
-    office = QuerySelectField('Office', validators=[InputRequired()], query_factory=officeChoice)
-    cartridge = QuerySelectField('Cartridge', validators=[InputRequired()], query_factory=cartridgeChoice)
-    in_out = SelectField('In/Out', choices=[(True, 'In'), (False, 'Out')], validators=[InputRequired()], coerce=lambda x: x == 'True')
-    amount = IntegerField('Amount', validators=[NumberRange(min=1), DataRequired()])
-    submit = SubmitField('Add Data')
+class ImportCatalogForm(FlaskForm):
+    file = FileField('Catalog file', validators=[FileRequired(), FileAllowed(['json', 'csv'], 'JSON or CSV files only.')])
+    section = SelectField('CSV contains', choices=[('cartridges', 'Cartridges'), ('printers', 'Printers'), ('offices', 'Offices')])
+    dry_run = BooleanField('Dry run, only report what would change')
+    submit = SubmitField('Import')
 
 
-class PrinterStockForm(FlaskForm):
-    office = QuerySelectField('Office', validators=[InputRequired()], query_factory=officeChoice)
-    printer = QuerySelectField('Printer', validators=[InputRequired()], query_factory=printerChoice)
-    in_out = SelectField('In/Out', choices=[(True, 'In'), (False, 'Out')], validators=[InputRequired()], coerce=lambda x: x == 'True')
+class StockMovementForm(FlaskForm):
+    office = CatalogSelectField('Office', validators=[InputRequired()], query_factory=officeChoice)
+    in_out = SelectField('In/Out', choices=[(True, 'In'), (False, 'Out')], validators=[InputRequired()], coerce=lambda x: x in (True, 'True'))
     amount = IntegerField('Amount', validators=[NumberRange(min=1), DataRequired()])
     submit = SubmitField('Add Data')
 
 
+class CartridgeStockForm(StockMovementForm):
+    cartridge = CatalogSelectField('Cartridge', validators=[InputRequired()], query_factory=cartridgeChoice)
+
+
+class PrinterStockForm(StockMovementForm):
+    printer = CatalogSelectField('Printer', validators=[InputRequired()], query_factory=printerChoice)
+
+
+class LedgerFilterForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    date_from = DateField('From', validators=[Optional()])
+    date_to = DateField('To', validators=[Optional()])
+    office = CatalogSelectField('Office', validators=[Optional()], query_factory=officeChoice, allow_blank=True, blank_text='Any')
+    cartridge = CatalogSelectField('Cartridge', validators=[Optional()], query_factory=cartridgeChoice, allow_blank=True, blank_text='Any')
+    printer = CatalogSelectField('Printer', validators=[Optional()], query_factory=printerChoice, allow_blank=True, blank_text='Any')
+    in_out = SelectField('In/Out', choices=[('', 'Any'), ('in', 'In'), ('out', 'Out')], validators=[Optional()])
+    submit = SubmitField('Filter')
+
+
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired()])
@@ -0,0 +1,167 @@
+import csv
+import json
+from sqlalchemy import bindparam
+from app import db
+from app.models import Cartridge, Printer, Office, cartridges, printers
+from app.catalog import bump_generation
+
+LIST_SEPARATOR = ';'
+
+# section -> (model, key columns, value columns, (link list column, linked section))
+SECTIONS = {
+    'cartridges': (Cartridge, ('cartridge_model',), ('color',), None),
+    'printers': (Printer, ('printer_model',), ('brand',), ('cartridges', 'cartridges')),
+    'offices': (Office, ('name', 'place'), (), ('printers', 'printers')),
+}
+# link table, column of the owning section, column of the linked section
+LINKS = {
+    'printers': (cartridges, 'printer_id', 'cartridge_id'),
+    'offices': (printers, 'office_id', 'printer_id'),
+}
+IMPORT_FORMATS = ('json', 'csv')
+
+
+class ImportReport(object):
+    def __init__(self):
+        self.created = dict.fromkeys(SECTIONS, 0)
+        self.updated = dict.fromkeys(SECTIONS, 0)
+        self.linked = dict.fromkeys(LINKS, 0)
+        self.conflicts = []
+        self.errors = []
+
+    def lines(self):
+        for section in SECTIONS:
+            yield '{}: {} new, {} updated'.format(section, self.created[section], self.updated[section])
+        for section in LINKS:
+            yield '{} links: {} new'.format(section, self.linked[section])
+        for conflict in self.conflicts:
+            yield 'conflict: {}'.format(conflict)
+        for error in self.errors:
+            yield 'error: {}'.format(error)
+
+
+def read_catalog(stream, format, section=None):
+    if format == 'json':
+        data = json.load(stream)
+        if not isinstance(data, dict):
+            raise ValueError('A JSON catalog must be an object with {} lists.'.format(', '.join(SECTIONS)))
+        return data
+    if section not in SECTIONS:
+        raise ValueError('A CSV catalog holds one section, one of: {}.'.format(', '.join(SECTIONS)))
+    rows = []
+    list_column = SECTIONS[section][3] and SECTIONS[section][3][0]
+    for row in csv.DictReader(stream):
+        if list_column and row.get(list_column) is not None:
+            row[list_column] = [value.strip() for value in row[list_column].split(LIST_SEPARATOR) if value.strip()]
+        rows.append(row)
+    return {section: rows}
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _plan_section(report, section, rows):
+    model, keys, values, link = SECTIONS[section]
+    table = model.__table__
+    existing = {tuple(row[1:len(keys) + 1]): row for row in
+                db.session.query(table.c.id, *[table.c[column] for column in keys + values])}
+    if not isinstance(rows, list):
+        report.errors.append('{} must be a list.'.format(section))
+        rows = []
+    new, updates, links, seen = [], [], {}, set()
+    for number, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            report.errors.append('{} #{}: expected an object.'.format(section, number))
+            continue
+        record = {column: _text(row.get(column)) for column in keys + values}
+        key = tuple(record[column] for column in keys)
+        for column in keys + values:
+            length = table.c[column].type.length
+            if record[column] is None and column in keys:
+                report.errors.append('{} #{}: {} is required.'.format(section, number, column))
+            elif record[column] is not None and length and len(record[column]) > length:
+                report.errors.append('{} #{}: {} is longer than {}.'.format(section, number, column, length))
+        if key in seen:
+            report.errors.append('{} #{}: {} appears more than once.'.format(section, number, ' / '.join(map(str, key))))
+            continue
+        seen.add(key)
+        if link:
+            linked = row.get(link[0]) or []
+            links[key] = [value for value in map(_text, linked if isinstance(linked, list) else [linked]) if value]
+        if key not in existing:
+            new.append(record)
+            continue
+        current = dict(zip(('id',) + keys + values, existing[key]))
+        changed = {column: record[column] for column in values
+                   if record[column] is not None and record[column] != current[column]}
+        if changed:
+            report.conflicts.append('{} {}: {}'.format(section, ' / '.join(key), ', '.join(
+                '{} {!r} -> {!r}'.format(column, current[column], value) for column, value in sorted(changed.items()))))
+            updates.append(dict(changed, _id=current['id']))
+    report.created[section] = len(new)
+    report.updated[section] = len(updates)
+    return new, updates, links, set(existing) | seen
+
+
+def _key_ids(section):
+    model, keys = SECTIONS[section][:2]
+    table = model.__table__
+    return {tuple(row[1:]): row[0] for row in db.session.query(table.c.id, *[table.c[column] for column in keys])}
+
+
+def import_catalog(data, dry_run=False):
+    # Everything is checked before the first write; the import then runs as one
+    # transaction of executemany inserts and updates, or is rolled back entirely.
+    report = ImportReport()
+    plans = {section: _plan_section(report, section, data.get(section) or []) for section in SECTIONS}
+    for section, (table, owner_column, linked_column) in LINKS.items():
+        linked_section = SECTIONS[section][3][1]
+        known = plans[linked_section][3]
+        for key, linked_keys in plans[section][2].items():
+            for linked_key in linked_keys:
+                if (linked_key,) not in known:
+                    report.errors.append('{} {}: unknown {} {!r}.'.format(section, ' / '.join(key), linked_section,
+                                                                          linked_key))
+    if report.errors:
+        return report
+    ids = {}
+    for section, (model, keys, values, link) in SECTIONS.items():
+        new, updates = plans[section][:2]
+        table = model.__table__
+        if not dry_run and new:
+            db.session.execute(table.insert(), new)
+        if not dry_run and updates:
+            # one executemany per distinct set of changed columns
+            for columns in {tuple(sorted(set(update) - {'_id'})) for update in updates}:
+                batch = [{'_' + name: value for name, value in update.items()} for update in updates
+                         if tuple(sorted(set(update) - {'_id'})) == columns]
+                db.session.execute(table.update().where(table.c.id == bindparam('__id'))
+                                   .values({column: bindparam('_' + column) for column in columns}), batch)
+        ids[section] = _key_ids(section)
+    for section, (table, owner_column, linked_column) in LINKS.items():
+        linked_section = SECTIONS[section][3][1]
+        existing = set(db.session.query(table.c[owner_column], table.c[linked_column]))
+        pairs = set()
+        for key, linked_keys in plans[section][2].items():
+            owner = ids[section].get(key)
+            for linked_key in linked_keys:
+                pair = (owner, ids[linked_section].get((linked_key,)))
+                if None in pair:
+                    # only in a dry run: one side of the link has not been inserted
+                    pairs.add((key, linked_key))
+                elif pair not in existing:
+                    pairs.add(pair)
+        report.linked[section] = len(pairs)
+        if not dry_run and pairs:
+            db.session.execute(table.insert(), [{owner_column: owner, linked_column: linked}
+                                                for owner, linked in pairs])
+    if dry_run:
+        db.session.rollback()
+        return report
+    bump_generation(db.session)
+    db.session.commit()
+    return report
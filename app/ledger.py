@@ -0,0 +1,119 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from sqlalchemy import tuple_
+from app import db
+from app.models import Cartridge, Printer, Office, StockMovement, CartridgeStock, PrinterStock
+from app.stock import LEDGERS, LEDGER_NAMES, warehouse_id
+from app.alerts import stock_level
+
+# ledger model -> (catalog model, column holding the model name)
+ITEMS = {
+    CartridgeStock: (Cartridge, Cartridge.cartridge_model),
+    PrinterStock: (Printer, Printer.printer_model),
+}
+LEDGER_TABLES = {LEDGER_NAMES[model]: model for model in ITEMS}
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+StockBalance = namedtuple('StockBalance', 'id model amount level')
+
+
+def ledger_query(model, source=None):
+    # `source` reads the same columns from somewhere else, e.g. a yearly archive table
+    source = model if source is None else source
+    item, item_name = ITEMS[model]
+    item_key = LEDGERS[model][1]
+    return db.session.query(source.id, source.date, Office.place, Office.name.label('office'),
+                            item_name.label(item_key), source.in_out, source.amount) \
+        .outerjoin(Office, Office.id == source.office) \
+        .outerjoin(item, item.id == getattr(source, item_key))
+
+
+def ledger_id_query(model):
+    # the ledger columns alone, no joins: callers name offices and items from the catalog cache
+    return db.session.query(model.id, model.date, model.office, model.item_id, model.in_out, model.amount)
+
+
+def movements_query():
+    # every ledger in one pass over stock_movement, each item named from its own catalog
+    names = [item_name for item, item_name in ITEMS.values()]
+    query = db.session.query(StockMovement.id, StockMovement.date, StockMovement.item_type, StockMovement.item_id,
+                             db.func.coalesce(*names).label('item'), Office.place, Office.name.label('office'),
+                             StockMovement.in_out, StockMovement.amount) \
+        .outerjoin(Office, Office.id == StockMovement.office)
+    for model, (item, item_name) in ITEMS.items():
+        query = query.outerjoin(item, db.and_(StockMovement.item_type == LEDGERS[model][1],
+                                              item.id == StockMovement.item_id))
+    return query
+
+
+def stock_balances(model, office=None):
+    item, item_name = ITEMS[model]
+    balance, item_key = LEDGERS[model]
+    office = warehouse_id() if office is None else office
+    rows = db.session.query(item.id, item_name, db.func.coalesce(balance.amount, 0), item.warning_level,
+                            item.critical_level) \
+        .outerjoin(balance, db.and_(getattr(balance, item_key) == item.id, balance.office == office)) \
+        .order_by(item.id)
+    return [StockBalance(id, name, amount, stock_level(amount, warning_level, critical_level, item_key))
+            for id, name, amount, warning_level, critical_level in rows]
+
+
+def filter_ledger(query, model, date_from=None, date_to=None, office=None, item=None, in_out=None, source=None):
+    source = model if source is None else source
+    if date_from is not None:
+        query = query.filter(source.date >= datetime.combine(date_from, time.min))
+    if date_to is not None:
+        query = query.filter(source.date < datetime.combine(date_to + timedelta(days=1), time.min))
+    if office is not None:
+        query = query.filter(source.office == office)
+    if item is not None:
+        query = query.filter(getattr(source, LEDGERS[model][1]) == item)
+    if in_out is not None:
+        query = query.filter(source.in_out == in_out)
+    return query
+
+
+def encode_cursor(row):
+    return '{}-{}'.format(row.date.strftime(CURSOR_FORMAT), row.id)
+
+
+def decode_cursor(cursor):
+    try:
+        date, id = cursor.split('-')
+        return datetime.strptime(date, CURSOR_FORMAT), int(id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(query, source, cursor, page_size):
+    # keyset pagination on (date, id): every page is an index range scan, however deep
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(tuple_(source.date, source.id) < position)
+    return query.order_by(source.date.desc(), source.id.desc()).limit(page_size + 1)
+
+
+def split_page(rows, page_size):
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def ledger_page_query(model, cursor=None, page_size=50, **filters):
+    return keyset_page(filter_ledger(ledger_query(model), model, **filters), model, cursor, page_size)
+
+
+def ledger_page(model, cursor=None, page_size=50, **filters):
+    return split_page(ledger_page_query(model, cursor, page_size, **filters).all(), page_size)
+
+
+def ledger_id_page(model, cursor=None, page_size=50, **filters):
+    query = keyset_page(filter_ledger(ledger_id_query(model), model, **filters), model, cursor, page_size)
+    return split_page(query.all(), page_size)
+
+
+def movements_page_query(cursor=None, page_size=50, **filters):
+    return keyset_page(filter_ledger(movements_query(), StockMovement, **filters), StockMovement, cursor, page_size)
+
+
+def movements_page(cursor=None, page_size=50, **filters):
+    return split_page(movements_page_query(cursor, page_size, **filters).all(), page_size)
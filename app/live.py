@@ -0,0 +1,135 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from flask import current_app
+from app import db
+from app.models import StockMovement
+from app.stock import LEDGERS
+from app.ledger import movements_query, stock_balances
+from app.dashboard import dashboard_state
+
+logger = logging.getLogger(__name__)
+
+# seq orders the batches of this process, start/end are ledger sequences; data None means reload
+Batch = namedtuple('Batch', 'seq start end data')
+
+
+def movement_batch(after, until):
+    # the rows committed in ledger sequences (after, until] and the warehouse balances they
+    # changed, None if too many
+    limit = current_app.config['LIVE_BATCH_LIMIT']
+    rows = movements_query().filter(StockMovement.sequence > after, StockMovement.sequence <= until) \
+        .order_by(StockMovement.sequence, StockMovement.id).limit(limit + 1).all()
+    if len(rows) > limit:
+        return None
+    touched = defaultdict(set)
+    for row in rows:
+        touched[row.item_type].add(row.item_id)
+    balances = []
+    for model, (balance, item_key) in LEDGERS.items():
+        if touched[item_key]:
+            balances += [[item_key, item.id, item.amount, item.level] for item in stock_balances(model)
+                         if item.id in touched[item_key]]
+    return {'rows': [[row.id, row.item_type, row.date.strftime('%d.%m.%Y %H:%M'), row.place, row.office, row.item,
+                      None if row.in_out is None else ('In' if row.in_out else 'Out'), row.amount] for row in rows],
+            'balances': balances}
+
+
+def sse(event, data=None, id=None):
+    lines = ['event: {}'.format(event)]
+    if id is not None:
+        lines.append('id: {}'.format(id))
+    lines.append('data: {}'.format(json.dumps(data, separators=(',', ':'))))
+    return '\n'.join(lines) + '\n\n'
+
+
+class LiveFeed(object):
+    # Committed movements as batches, shared by every open stream of this process. Each
+    # batch is read from the database once, however many dashboards are watching.
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._batches = deque()
+        self._seq = 0
+        self._state = None
+        self._subscribers = 0
+        self._poller = None
+
+    def refresh(self):
+        # called right after a local write, and by the poller for other processes' writes
+        state = dashboard_state()
+        key = (state.high_water, state.ledger_generation, state.catalog_generation)
+        with self._condition:
+            previous = self._state
+            if previous is None or not self._subscribers:
+                self._state = key
+                return
+            if key == previous:
+                return
+        # read without the lock, so streams waiting for batches are not held up by the query;
+        # edits, deletes and catalog changes rewrite what is on screen: reload the page
+        data = movement_batch(previous[0], key[0]) if key[1:] == previous[1:] else None
+        with self._condition:
+            if self._state != previous:
+                # a concurrent refresh got there first, the next one picks up the rest
+                return
+            self._seq += 1
+            self._batches.append(Batch(self._seq, previous[0], key[0], data))
+            while len(self._batches) > current_app.config['LIVE_BUFFER_SIZE']:
+                self._batches.popleft()
+            self._state = key
+            self._condition.notify_all()
+
+    def publish(self):
+        if self._subscribers:
+            self.refresh()
+
+    def subscribe(self, app, after):
+        # The local position of a client that has seen the ledger up to sequence `after`,
+        # or None when that is older than the kept batches.
+        with self._condition:
+            self._subscribers += 1
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, args=(app,), daemon=True)
+                self._poller.start()
+            self._condition.wait_for(lambda: self._state is not None, app.config['LIVE_KEEPALIVE_SECONDS'])
+            if self._state is None or after is None or after >= self._state[0]:
+                return self._seq
+            for batch in self._batches:
+                if batch.start <= after < batch.end:
+                    return batch.seq - 1
+            return None
+
+    def unsubscribe(self):
+        with self._condition:
+            self._subscribers -= 1
+
+    def wait(self, position, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > position, timeout)
+            batches = [batch for batch in self._batches if batch.seq > position]
+            if batches and batches[0].seq > position + 1:
+                # the client fell behind the kept batches
+                return [Batch(self._seq, None, None, None)], self._seq
+            return batches, self._seq
+
+    def _poll(self, app):
+        # other worker processes are seen through the shared ledger sequence
+        while True:
+            with self._condition:
+                if not self._subscribers:
+                    self._poller, self._state = None, None
+                    self._batches.clear()
+                    return
+            with app.app_context():
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception('Live feed refresh failed')
+                finally:
+                    db.session.remove()
+            time.sleep(app.config['LIVE_POLL_SECONDS'])
+
+
+live_feed = LiveFeed()
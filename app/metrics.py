@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from flask import Blueprint, g, request, has_request_context, Response, current_app
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+# endpoint -> running totals, kept per process
+_requests = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS),
+                                 'queries': 0, 'query_seconds': 0.0, 'over_budget': 0})
+
+bp = Blueprint('metrics', __name__)
+
+
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_start'].pop()
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries += 1
+        g.metrics_query_seconds += elapsed
+
+
+@bp.record_once
+def time_queries(state):
+    for bind in [None] + list(state.app.config['SQLALCHEMY_BINDS']):
+        engine = db.get_engine(state.app, bind)
+        event.listen(engine, 'before_cursor_execute', start_query)
+        event.listen(engine, 'after_cursor_execute', count_query)
+
+
+@bp.before_app_request
+def start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_query_seconds = 0.0
+
+
+@bp.teardown_app_request
+def observe_request(exception=None):
+    if 'metrics_start' not in g:
+        return
+    elapsed = time.perf_counter() - g.metrics_start
+    endpoint = request.endpoint or 'unmatched'
+    budget = current_app.config['SQL_QUERY_BUDGET']
+    over_budget = budget and g.metrics_queries > budget
+    if over_budget:
+        logger.warning('%s %s ran %d queries (budget %d)', request.method, request.path, g.metrics_queries, budget)
+    with _lock:
+        totals = _requests[endpoint]
+        totals['count'] += 1
+        totals['seconds'] += elapsed
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                totals['buckets'][index] += 1
+        totals['queries'] += g.metrics_queries
+        totals['query_seconds'] += g.metrics_query_seconds
+        totals['over_budget'] += bool(over_budget)
+
+
+def _metric(lines, name, kind, help, samples):
+    lines.append('# HELP {} {}'.format(name, help))
+    lines.append('# TYPE {} {}'.format(name, kind))
+    for suffix, labels, value in samples:
+        label_text = ','.join('{}="{}"'.format(key, value) for key, value in labels)
+        lines.append('{}{}{{{}}} {}'.format(name, suffix, label_text, value))
+
+
+def render_metrics():
+    with _lock:
+        snapshot = {endpoint: dict(totals, buckets=list(totals['buckets'])) for endpoint, totals in _requests.items()}
+    endpoints = sorted(snapshot)
+    lines = []
+    histogram = []
+    for endpoint in endpoints:
+        totals = snapshot[endpoint]
+        for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+            histogram.append(('_bucket', (('endpoint', endpoint), ('le', bound)), count))
+        histogram.append(('_bucket', (('endpoint', endpoint), ('le', '+Inf')), totals['count']))
+        histogram.append(('_sum', (('endpoint', endpoint),), totals['seconds']))
+        histogram.append(('_count', (('endpoint', endpoint),), totals['count']))
+    _metric(lines, 'it_store_request_duration_seconds', 'histogram', 'Wall time of a request.', histogram)
+    _metric(lines, 'it_store_request_queries_total', 'counter', 'SQL statements run by requests.',
+            [('', (('endpoint', endpoint),), snapshot[endpoint]['queries']) for endpoint in endpoints])
+    _metric(lines, 'it_store_request_query_seconds_total', 'counter', 'Time requests spent in the database.',
+            [('', (('endpoint', endpoint),), snapshot[endpoint]['query_seconds']) for endpoint in endpoints])
+    _metric(lines, 'it_store_request_over_query_budget_total', 'counter',
+            'Requests that ran more SQL statements than SQL_QUERY_BUDGET.',
+            [('', (('endpoint', endpoint),), snapshot[endpoint]['over_budget']) for endpoint in endpoints])
+    return '\n'.join(lines) + '\n'
+
+
+@bp.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -1,8 +1,11 @@
+import threading
+import time
+from flask import current_app, g
+from sqlalchemy import event
 from app import db, login
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from flask_admin.contrib.sqla import ModelView
 from datetime import datetime
 
 cartridges = db.Table('cartridges',
@@ -16,26 +19,6 @@ printers = db.Table('printers',
                     )
 
 
-def date_formatter(view, context, model, name):
-    return model.date.strftime('%d.%m.%Y %H:%M:%S')
-
-
-def cartridge_formatter(view, context, model, name):
-    return Cartridge.query.filter_by(id=model.cartridge).first().cartridge_model
-
-
-def printer_formatter(view, context, model, name):
-    return Printer.query.filter_by(id=model.printer).first().printer_model
-
-
-def office_formatter(view, context, model, name):
-    return Office.query.filter_by(id=model.office).first().name
-
-
-def role_formatter(view, context, model, name):
-    return Role.query.filter_by(id=model.id).first().name
-
-
 class Role(db.Model):
     __tablename__ = 'roles'
     id = db.Column(db.Integer(), primary_key=True)
@@ -45,10 +28,6 @@ class Role(db.Model):
         return self.name
 
 
-class RoleView(ModelView):
-    column_formatters = {'name': role_formatter}
-
-
 class UserRoles(db.Model):
     __tablename__ = 'user_roles'
     id = db.Column(db.Integer(), primary_key=True)
@@ -62,8 +41,7 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(128), index=True, unique=True)
     password_hash = db.Column(db.String(128))
     roles = db.relationship('Role', secondary='user_roles')
-    cartridge_stock_records = db.relationship('CartridgeStock', backref='user', lazy='dynamic')
-    printer_stock_records = db.relationship('PrinterStock', backref='user', lazy='dynamic')
+    stock_movements = db.relationship('StockMovement', backref='user', lazy='dynamic')
 
     def __repr__(self):
         return 'User {}'.format(self.username)
@@ -74,50 +52,112 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    @property
+    def role_names(self):
+        # resolved once per loaded user, i.e. once per request for current_user
+        if '_role_names' not in self.__dict__:
+            generation = role_generation()
+            names = role_cache.get(self.id, generation)
+            if names is None:
+                names = frozenset(role.name for role in self.roles)
+                role_cache.set(self.id, names, generation)
+            self.__dict__['_role_names'] = names
+        return self.__dict__['_role_names']
+
     def has_role(self, role):
-        search_role = Role.query.filter_by(name=role).first()
-        if search_role in self.roles:
-            return True
-        else:
-            return False
+        return role in self.role_names
 
     @login.user_loader
     def load_user(id):
-        return User.query.get(int(id))
+        # the role generation comes with the user row, so role checks add no query of their own
+        generation = db.select([RoleVersion.generation]).where(RoleVersion.id == 1).as_scalar()
+        row = db.session.query(User, generation).filter(User.id == int(id)).first()
+        if row is None:
+            return None
+        g.role_generation = row[1] or 0
+        return row[0]
+
+
+class RoleVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+
+def bump_version(session, model):
+    table = model.__table__
+    result = session.execute(table.update().where(table.c.id == 1).values(generation=table.c.generation + 1))
+    if result.rowcount == 0:
+        session.execute(table.insert().values(id=1, generation=1))
+
+
+def role_generation():
+    # load_user reads it with the user row; other role checks look it up once per request.
+    # It tells every process whether its cached roles are stale.
+    if 'role_generation' not in g:
+        g.role_generation = db.session.query(RoleVersion.generation).filter_by(id=1).scalar() or 0
+    return g.role_generation
 
 
-class UserView(ModelView):
-    can_create=False
-    column_list = ['username', 'email', 'roles']
+class RoleCache(object):
+    # user id -> frozenset of role names, shared by the requests of one process and
+    # dropped as a whole when the role generation moves
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = {}
+
+    def get(self, user_id, generation):
+        entry = self._entries.get(user_id)
+        if generation != self._generation or entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id, names, generation):
+        with self._lock:
+            if generation != self._generation:
+                self._generation, self._entries = generation, {}
+            self._entries[user_id] = (time.monotonic() + current_app.config['ROLE_CACHE_SECONDS'], names)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+role_cache = RoleCache()
+
+
+@event.listens_for(db.session, 'after_flush')
+def invalidate_roles(session, flush_context):
+    changed = list(session.new) + list(session.deleted) + list(session.dirty)
+    if any(isinstance(obj, (Role, UserRoles)) for obj in changed) \
+            or any(isinstance(obj, User) and db.inspect(obj).attrs.roles.history.has_changes() for obj in changed):
+        bump_version(session, RoleVersion)
+        g.pop('role_generation', None)
 
 
 class Cartridge(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     cartridge_model = db.Column(db.String(64), index=True, unique=True)
     color = db.Column(db.String(10), index=True)
+    warning_level = db.Column(db.Integer)
+    critical_level = db.Column(db.Integer)
 
     def __repr__(self):
         return '{}'.format(self.cartridge_model)
 
 
-class CartridgeView(ModelView):
-    can_create = False
-
-
 class Printer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     brand = db.Column(db.String(64), index=True)
     printer_model = db.Column(db.String(64), index=True, unique=True)
+    warning_level = db.Column(db.Integer)
+    critical_level = db.Column(db.Integer)
     cartridges = db.relationship('Cartridge', secondary=cartridges, backref=db.backref('printers', lazy='dynamic'))
 
     def __repr__(self):
         return '{} {}'.format(self.brand, self.printer_model)
 
 
-class PrinterView(ModelView):
-    can_create = False
-
-
 class Office(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(250), index=True)
@@ -128,48 +168,156 @@ class Office(db.Model):
         return '{} at {}'.format(self.name, self.place)
 
 
-class OfficeView(ModelView):
-    can_create = False
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LedgerVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
 
 
-class CartridgeStock(db.Model):
+class LedgerSequence(db.Model):
+    # bumped by every transaction that appends movements; the row lock hands out the
+    # values in commit order, which ids do not follow on a server database
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StockMovement(db.Model):
+    # one ledger for every kind of item: `item_type` says which catalog `item_id` points into
+    __table_args__ = (
+        # covers the balance totals: grouped by item, office and direction, summing amount
+        db.Index('ix_stock_movement_item_in_out', 'item_type', 'item_id', 'in_out', 'office', 'amount'),
+        db.Index('ix_stock_movement_item_type_date', 'item_type', 'date'),
+        db.Index('ix_stock_movement_item_date', 'item_type', 'item_id', 'date'),
+        db.Index('ix_stock_movement_office_date', 'office', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime, index=True, default=datetime.now)
+    item_type = db.Column(db.String(20), nullable=False)
+    item_id = db.Column(db.Integer)
     in_out = db.Column(db.Boolean)
     office = db.Column(db.Integer, db.ForeignKey('office.id'))
-    cartridge = db.Column(db.Integer, db.ForeignKey('cartridge.id'))
-    amount = db.Column(db.Integer, index=True)
+    amount = db.Column(db.Integer)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # the ledger sequence of the transaction that wrote the row
+    sequence = db.Column(db.Integer, index=True,
+                         default=db.select([LedgerSequence.generation]).where(LedgerSequence.id == 1).as_scalar())
+    __mapper_args__ = {'polymorphic_on': item_type}
 
     def __repr__(self):
-        self.office = Office.query.filter_by(id=self.office).first().name
-        self.cartridge = Cartridge.query.filter_by(id=self.cartridge).first().cartridge_model
-        return '{} to {} , amount {}, {}'.format(self.cartridge, self.office, self.amount, self.in_out)
+        return '{} {} to office {}, amount {}'.format(self.item_type.capitalize(), self.item_id, self.office,
+                                                     self.amount)
+
 
+class CartridgeStock(StockMovement):
+    __mapper_args__ = {'polymorphic_identity': 'cartridge'}
+    cartridge = db.synonym('item_id')
+
+    def __repr__(self):
+        return 'Cartridge {} to office {}, amount {}, {}'.format(self.cartridge, self.office, self.amount, self.in_out)
 
-class CartridgeStockView(ModelView):
-    can_create = False
-    column_hide_backrefs = False
-    column_list = [CartridgeStock.date, CartridgeStock.in_out, CartridgeStock.office, CartridgeStock.cartridge, CartridgeStock.amount]
-    column_formatters = {'date': date_formatter, 'office': office_formatter, 'cartridge': cartridge_formatter}
 
+class PrinterStock(StockMovement):
+    __mapper_args__ = {'polymorphic_identity': 'printer'}
+    printer = db.synonym('item_id')
 
-class PrinterStock(db.Model):
+    def __repr__(self):
+        return 'Printer {} to office {}, amount {}'.format(self.printer, self.office, self.amount)
+
+
+class CartridgeBalance(db.Model):
+    __table_args__ = (db.UniqueConstraint('cartridge', 'office', name='uq_cartridge_balance_cartridge_office'),)
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.DateTime, index=True, default=datetime.now)
-    in_out = db.Column(db.Boolean)
-    office = db.Column(db.Integer, db.ForeignKey('office.id'))
-    printer = db.Column(db.Integer, db.ForeignKey('printer.id'))
-    amount = db.Column(db.Integer, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    cartridge = db.Column(db.Integer, db.ForeignKey('cartridge.id'), nullable=False)
+    office = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return 'Balance of cartridge {} at office {}: {}'.format(self.cartridge, self.office, self.amount)
+
+
+class PrinterBalance(db.Model):
+    __table_args__ = (db.UniqueConstraint('printer', 'office', name='uq_printer_balance_printer_office'),)
+    id = db.Column(db.Integer, primary_key=True)
+    printer = db.Column(db.Integer, db.ForeignKey('printer.id'), nullable=False)
+    office = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return 'Balance of printer {} at office {}: {}'.format(self.printer, self.office, self.amount)
+
+
+class StockCheckpoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, index=True, unique=True, nullable=False)
+    created = db.Column(db.DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return 'Checkpoint {}'.format(self.date)
+
+
+class CartridgeSnapshot(db.Model):
+    __table_args__ = (db.UniqueConstraint('checkpoint', 'cartridge', 'office', name='uq_cartridge_snapshot_checkpoint_cartridge_office'),)
+    id = db.Column(db.Integer, primary_key=True)
+    checkpoint = db.Column(db.Integer, db.ForeignKey('stock_checkpoint.id', ondelete='CASCADE'), nullable=False)
+    cartridge = db.Column(db.Integer, db.ForeignKey('cartridge.id'), nullable=False)
+    office = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+
+
+class PrinterSnapshot(db.Model):
+    __table_args__ = (db.UniqueConstraint('checkpoint', 'printer', 'office', name='uq_printer_snapshot_checkpoint_printer_office'),)
+    id = db.Column(db.Integer, primary_key=True)
+    checkpoint = db.Column(db.Integer, db.ForeignKey('stock_checkpoint.id', ondelete='CASCADE'), nullable=False)
+    printer = db.Column(db.Integer, db.ForeignKey('printer.id'), nullable=False)
+    office = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+
+
+class CartridgeOpening(db.Model):
+    # balance carried forward from the archived movements, as of `date` (the archive cut-off)
+    __table_args__ = (db.UniqueConstraint('cartridge', 'office', name='uq_cartridge_opening_cartridge_office'),)
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.DateTime, nullable=False)
+    cartridge = db.Column(db.Integer, db.ForeignKey('cartridge.id'), nullable=False)
+    office = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+
+
+class PrinterOpening(db.Model):
+    __table_args__ = (db.UniqueConstraint('printer', 'office', name='uq_printer_opening_printer_office'),)
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.DateTime, nullable=False)
+    printer = db.Column(db.Integer, db.ForeignKey('printer.id'), nullable=False)
+    office = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+
+
+class LedgerArchive(db.Model):
+    __table_args__ = (db.UniqueConstraint('ledger', 'year', name='uq_ledger_archive_ledger_year'),)
+    id = db.Column(db.Integer, primary_key=True)
+    ledger = db.Column(db.String(32), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.DateTime, default=datetime.now)
 
     def __repr__(self):
-        self.office = Office.query.filter_by(id=self.office).first().name
-        self.printer = Printer.query.filter_by(id=self.printer).first().printer_model
-        return '{} to {} , amount {}'.format(self.printer, self.office, self.amount)
+        return '{} {}: {} rows'.format(self.ledger, self.year, self.rows)
 
 
-class PrinterStockView(ModelView):
-    can_create = False
-    column_list = [PrinterStock.date, PrinterStock.in_out, PrinterStock.office, PrinterStock.printer, PrinterStock.amount]
-    column_formatters = {'date': date_formatter, 'office': office_formatter, 'printer': printer_formatter}
+class StockAlert(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.DateTime, index=True, default=datetime.now)
+    item_type = db.Column(db.String(20))
+    item = db.Column(db.Integer)
+    previous_level = db.Column(db.String(10))
+    level = db.Column(db.String(10))
+    amount = db.Column(db.Integer)
+
+    def __repr__(self):
+        return '{} {} is {} ({})'.format(self.item_type, self.item, self.level, self.amount)
@@ -1,106 +1,158 @@
-from flask import render_template, flash, redirect, url_for, request
+import io
+from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify, abort, Response, \
+    stream_with_context, current_app, session, make_response
+from werkzeug.http import is_resource_modified
 from flask_login import current_user, login_user, logout_user, login_required
-from flask_admin import expose, AdminIndexView, Admin
-from app import app, db
+from app import db
 from app.forms import AddTypeForm, AddCartridgeForm, AddPrinterForm, AddOfficeForm, CartridgeStockForm, \
-    PrinterStockForm, LoginForm, RegistrationForm
-from app.models import User, Role, RoleView, UserRoles, UserView, Cartridge, CartridgeView, Printer, PrinterView, \
-    Office, OfficeView, CartridgeStock, CartridgeStockView, PrinterStock, PrinterStockView
-from datetime import datetime
-
-
-class MyAdminIndexView(AdminIndexView):
-    @expose('/')
-    def index(self):
-        if current_user.is_authenticated:
-            if not current_user.has_role('Admin'):
-                flash('You do not have enough permissons for opening this page.')
-                return redirect(url_for('index'))
-            return super(MyAdminIndexView, self).index()
-        else:
-            return redirect(url_for('index'))
+    PrinterStockForm, LedgerFilterForm, ImportCatalogForm, LoginForm, RegistrationForm
+from app.models import User, Role, Cartridge, Printer, Office, CartridgeStock, PrinterStock
+from app.stock import LEDGERS, write_movements, archived_years, Movement
+from app.ledger import ledger_page, stock_balances, LEDGER_TABLES
+from app.export import export_chunks, EXPORT_FORMATS
+from app.imports import read_catalog, import_catalog
+from app.analytics import reorder_forecast
+from app.catalog import cartridge_choices, catalog
+from app.dashboard import dashboard_state, dashboard_etag, cached_fragment
+from app.routing import use_primary
+from app.live import live_feed, sse
+
+bp = Blueprint('main', __name__)
 
 
-admin = Admin(app, name='IT Store', index_view=MyAdminIndexView(), template_mode='bootstrap3')
-admin.add_view(UserView(User, db.session))
-admin.add_view(RoleView(Role, db.session))
-admin.add_view(CartridgeView(Cartridge, db.session))
-admin.add_view(PrinterView(Printer, db.session))
-admin.add_view(OfficeView(Office, db.session))
-admin.add_view(CartridgeStockView(CartridgeStock, db.session))
-admin.add_view(PrinterStockView(PrinterStock, db.session))
+@bp.route('/', methods=['GET', 'POST'])
+@bp.route('/index', methods=['GET', 'POST'])
+def index():
+    state = dashboard_state()
+    # a page carrying flashed messages must not be served again from the browser cache
+    conditional = '_flashes' not in session
+    etag = dashboard_etag(state, current_user.get_id(), request.query_string)
+    # the newest ledger date misses edits, deletes and catalog changes: only the ETag decides
+    if conditional and not is_resource_modified(request.environ, etag=etag):
+        return dashboardResponse(Response(status=304), etag)
+    form = LedgerFilterForm(request.args)
+    filters, cartridge_filters, printer_filters = {}, {}, {}
+    if form.validate():
+        filters = {'date_from': form.date_from.data, 'date_to': form.date_to.data,
+                   'office': getattr(form.office.data, 'id', None),
+                   'in_out': {'in': True, 'out': False}.get(form.in_out.data)}
+        cartridge_filters = dict(filters, item=getattr(form.cartridge.data, 'id', None))
+        printer_filters = dict(filters, item=getattr(form.printer.data, 'id', None))
+    args = request.args.to_dict()
+    cartridge_fragment = ledgerFragment(state, CartridgeStock, 'Cartridge', args, 'cartridge_after', cartridge_filters)
+    printer_fragment = ledgerFragment(state, PrinterStock, 'Printer', args, 'printer_after', printer_filters)
+    response = make_response(render_template(
+        'index.html', form=form, cartridge_fragment=cartridge_fragment, printer_fragment=printer_fragment,
+        filtered=bool(args), live_after=state.high_water,
+        export_args={key: args[key] for key in ('date_from', 'date_to', 'office') if args.get(key)}))
+    return dashboardResponse(response, etag if conditional else None)
 
 
-def cartridgeAmount(cartridge):
-    cart_amount = 0
-    for i in CartridgeStock.query.filter_by(cartridge=cartridge.id, in_out=True):
-        cart_amount += i.amount
-    for j in CartridgeStock.query.filter_by(cartridge=cartridge.id, in_out=False):
-        cart_amount -= j.amount
-    return cart_amount
+@bp.route('/events')
+def events():
+    # new ledger rows and balances for an unfiltered dashboard, "reset" when it has to reload
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = request.args.get('after', type=int)
+    app = current_app._get_current_object()
 
+    def stream():
+        yield 'retry: 3000\n\n'
+        # a client gone before this point was never counted, so it is not uncounted either
+        position = live_feed.subscribe(app, after)
+        try:
+            while position is not None:
+                batches, position = live_feed.wait(position, app.config['LIVE_KEEPALIVE_SECONDS'])
+                if not batches:
+                    yield ': keepalive\n\n'
+                for batch in batches:
+                    if batch.data is None:
+                        position = None
+                        break
+                    yield sse('movements', batch.data, batch.end)
+            yield sse('reset')
+        finally:
+            live_feed.unsubscribe()
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-def printerAmount(printer):
-    printer_amount = 0
-    for i in PrinterStock.query.filter_by(printer=printer.id, in_out=True):
-        printer_amount += i.amount
-    for j in PrinterStock.query.filter_by(printer=printer.id, in_out=False):
-        printer_amount -= j.amount
-    return printer_amount
 
+def ledgerFragment(state, model, item_title, args, cursor_arg, filters):
+    def render():
+        records, next_cursor = ledger_page(model, args.get(cursor_arg), current_app.config['LEDGER_PAGE_SIZE'],
+                                           **filters)
+        return render_template('_stock.html', balances=stock_balances(model), records=records,
+                               item_title=item_title, item_key=LEDGERS[model][1],
+                               next_url=next_cursor and url_for('main.index', **dict(args, **{cursor_arg: next_cursor})))
+    return cached_fragment(state, (LEDGERS[model][1], tuple(sorted(args.items()))), render)
 
-@app.route('/', methods=['GET', 'POST'])
-@app.route('/index', methods=['GET', 'POST'])
-def index():
-    cartridge_stock = CartridgeStock.query.order_by(CartridgeStock.date.desc()).all()
-    cartridge_stock_edit = [{'date': record.date,
-                             'place': Office.query.filter_by(id=record.office).first().place,
-                             'office': Office.query.filter_by(id=record.office).first().name,
-                             'cartridge': Cartridge.query.filter_by(id=record.cartridge).first().cartridge_model,
-                             'in_out': record.in_out,
-                             'amount': record.amount} for record in cartridge_stock]
-    cartridges_amount = [{'model': cartridge.cartridge_model,
-                          'amount': cartridgeAmount(cartridge)} for cartridge in Cartridge.query.all()]
-    printer_stock = PrinterStock.query.order_by(PrinterStock.date.desc()).all()
-    printer_stock_edit = [{'date': record.date,
-                           'place': Office.query.filter_by(id=record.office).first().place,
-                           'office': Office.query.filter_by(id=record.office).first().name,
-                           'printer': Printer.query.filter_by(id=record.printer).first().printer_model,
-                           'in_out': record.in_out,
-                           'amount': record.amount} for record in printer_stock]
-    printers_amount = [{'model': printer.printer_model,
-                        'amount': printerAmount(printer)} for printer in Printer.query.all()]
-    return render_template('index.html', cartridge_stock=cartridge_stock_edit, cartridges_amount=cartridges_amount,
-                           printer_stock=printer_stock_edit, printers_amount=printers_amount)
-
-
-@app.route('/login', methods=['GET', 'POST'])
+
+def dashboardResponse(response, etag):
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+@bp.route('/export/<ledger>.<format>')
+@login_required
+def export(ledger, format):
+    model = LEDGER_TABLES.get(ledger)
+    if model is None or format not in EXPORT_FORMATS:
+        abort(404)
+    year = request.args.get('archive', type=int)
+    if year is not None and year not in archived_years(model):
+        abort(404)
+    form = LedgerFilterForm(request.args)
+    if not form.validate():
+        abort(400)
+    chunks = export_chunks(model, format, current_app.config['EXPORT_CHUNK_SIZE'], year,
+                           date_from=form.date_from.data, date_to=form.date_to.data,
+                           office=getattr(form.office.data, 'id', None))
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[format],
+                    headers={'Content-Disposition': 'attachment; filename={}{}.{}'.format(
+                        ledger, '_{}'.format(year) if year else '', format)})
+
+
+@bp.route('/analytics')
+@login_required
+def analytics():
+    forecast, consumption = reorder_forecast()
+    offices = {item.id: item.label for item in catalog('office')}
+    cartridges = {item.id: item.label for item in catalog('cartridge')}
+    consumption = sorted(consumption, key=lambda row: (offices.get(row.office, ''), cartridges.get(row.cartridge, '')))
+    return render_template('analytics.html', title='Analytics', forecast=forecast, consumption=consumption,
+                           offices=offices, cartridges=cartridges, windows=sorted(current_app.config['CONSUMPTION_WINDOWS']))
+
+
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user is None or not user.check_password(form.password.data):
             flash('Invalid username or password')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         login_user(user, remember=form.remember_me.data)
         flash('Successfully logged in as {}'.format(user.username))
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     return render_template('login.html', title='Sign In', form=form)
 
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = RegistrationForm()
     if form.validate_on_submit():
         user = User(username=form.username.data, email=form.email.data)
@@ -110,21 +162,22 @@ def register():
         db.session.add(user)
         db.session.commit()
         flash('Congratulations, you are now a registered user!')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', title='Register', form=form)
 
 
-@app.route('/add', methods=['GET', 'POST'])
+@bp.route('/add', methods=['GET', 'POST'])
 @login_required
 def add():
     form = AddTypeForm()
     if form.validate_on_submit():
         type = form.type.data
-        return redirect(url_for('add_data', type=type))
+        return redirect(url_for('main.add_data', type=type))
     return render_template('add.html', title='Add Data', form=form)
 
 
-@app.route('/add_<type>', methods=['GET', 'POST'])
+@bp.route('/add_<type>', methods=['GET', 'POST'])
+@use_primary
 @login_required
 def add_data(type):
     if type == 'cartridge':
@@ -134,74 +187,84 @@ def add_data(type):
             db.session.add(cartridge)
             db.session.commit()
             flash('Info about {} {} successfully added.'.format(type, cartridge))
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     elif type == 'printer':
         form = AddPrinterForm()
         if form.validate_on_submit():
             printer = Printer(brand=form.brand.data, printer_model=form.printer_model.data)
-            for entry in form.cartridges.entries:
-                printer.cartridges.append(entry.data)
+            printer.cartridges = Cartridge.query.filter(
+                Cartridge.id.in_([entry.data.id for entry in form.cartridges.entries])).all()
             db.session.add(printer)
             db.session.commit()
             flash('Info about {} {} successfully added.'.format(type, printer))
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     elif type == 'office':
         form = AddOfficeForm()
         if form.validate_on_submit():
             office = Office(name=form.name.data, place=form.place.data)
-            for entry in form.printers.entries:
-                office.printers.append(entry.data)
+            office.printers = Printer.query.filter(
+                Printer.id.in_([entry.data.id for entry in form.printers.entries])).all()
             db.session.add(office)
             db.session.commit()
             flash('Info about {} {} successfully added.'.format(type, office))
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     return render_template('add_data.html', title='Add Data', type=type, form=form)
 
 
-@app.route('/cartridgestock', methods=['GET', 'POST'])
+@bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_data():
+    form = ImportCatalogForm()
+    report = None
+    if form.validate_on_submit():
+        format = form.file.data.filename.rsplit('.', 1)[-1].lower()
+        try:
+            data = read_catalog(io.StringIO(form.file.data.read().decode('utf-8-sig')), format, form.section.data)
+        except ValueError as error:
+            flash('Could not read {}: {}'.format(form.file.data.filename, error))
+            return redirect(url_for('main.import_data'))
+        report = import_catalog(data, dry_run=form.dry_run.data)
+        if not report.errors and not form.dry_run.data:
+            flash('Catalog imported.')
+    return render_template('import.html', title='Import Catalog', form=form, report=report)
+
+
+@bp.route('/cartridgestock', methods=['GET', 'POST'])
+@use_primary
 @login_required
 def cartridgestock():
     form = CartridgeStockForm()
-    if form.validate_on_submit():
-        stockitem = CartridgeStock(in_out=form.in_out.data, office=form.office.data.id,
-                                   cartridge=form.cartridge.data.id, amount=form.amount.data, user=current_user)
-        match = False
-        if form.in_out.data is False:
-            for printer in Office.query.filter_by(id=form.office.data.id).first().printers:
-                if form.cartridge.data.id in printer.cartridges and form.amount.data < cartridgeAmount(
-                        form.cartridge.data):
-                    match = True
-        if form.in_out.data is True and form.office.data.id == 1:
-            match = True
-        if match:
-            db.session.add(stockitem)
-            db.session.commit()
-            flash('Record added')
-            return redirect(url_for('index'))
-        else:
-            flash('Something went wrong. Check the entered data.')
-            return redirect(url_for('index'))
-    return render_template('cartridgestock.html', form=form)
+    office = request.form.get('office', type=int)
+    in_out = request.form.get('in_out', 'True') == 'True'
+    form.cartridge.query_factory = lambda: cartridge_choices(office, in_out)
+    return stockMovement(CartridgeStock, form, 'cartridgestock.html')
 
 
-@app.route('/printerstock', methods=['GET', 'POST'])
+@bp.route('/compatible_cartridges')
+@login_required
+def compatible_cartridges_list():
+    office = request.args.get('office', type=int)
+    in_out = request.args.get('in_out', 'True') == 'True'
+    return jsonify(cartridges=[item._asdict() for item in cartridge_choices(office, in_out)])
+
+
+@bp.route('/printerstock', methods=['GET', 'POST'])
+@use_primary
 @login_required
 def printerstock():
     form = PrinterStockForm()
+    return stockMovement(PrinterStock, form, 'printerstock.html')
+
+
+def stockMovement(model, form, template):
     if form.validate_on_submit():
-        stockitem = PrinterStock(in_out=form.in_out.data, office=form.office.data.id, printer=form.printer.data.id,
-                                 amount=form.amount.data, user=current_user)
-        match = False
-        if form.in_out.data is False and form.amount.data < printerAmount(form.printer.data):
-            match = True
-        if form.in_out.data is True and form.office.data.id == 1:
-            match = True
-        if match:
-            db.session.add(stockitem)
-            db.session.commit()
+        item = getattr(form, LEDGERS[model][1]).data
+        results = write_movements([(0, Movement(model, item.id, form.office.data.id, form.in_out.data,
+                                                form.amount.data))], current_user.id)
+        if results[0]['status'] == 'ok':
+            live_feed.publish()
             flash('Record added')
-            return redirect(url_for('index'))
         else:
-            flash('Something went wrong. Check the entered data.')
-            return redirect(url_for('index'))
-    return render_template('printerstock.html', form=form)
+            flash('Something went wrong. {}'.format(results[0]['error']))
+        return redirect(url_for('main.index'))
+    return render_template(template, form=form)
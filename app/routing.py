@@ -0,0 +1,57 @@
+import time
+from flask import g, request, session, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_BIND = 'read'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(SignallingSession):
+    # Reads of a request routed to the read engine go there; flushes and Core
+    # inserts, updates and deletes always go to the primary.
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            return super(RoutingSession, self).get_bind(mapper, clause)
+        if has_request_context() and g.get('db_route') == READ_BIND \
+                and READ_BIND in (self.app.config['SQLALCHEMY_BINDS'] or {}):
+            return get_state(self.app).db.get_engine(self.app, bind=READ_BIND)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+def remember_write(session):
+    if has_request_context():
+        g.db_wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        factory = orm.sessionmaker(class_=RoutingSession, db=self, **options)
+        event.listen(factory, 'after_commit', remember_write)
+        return factory
+
+
+def use_primary(view):
+    # views that write, whose forms should also be filled from the primary
+    view.use_primary = True
+    return view
+
+
+def uses_primary(app):
+    view = app.view_functions.get(request.endpoint)
+    return request.method not in SAFE_METHODS or getattr(view, 'use_primary', False) \
+        or session.get('primary_until', 0) > time.time()
+
+
+def init_routing(app):
+    @app.before_request
+    def choose_engine():
+        g.db_route = 'primary' if uses_primary(app) else READ_BIND
+
+    @app.after_request
+    def start_read_your_writes(response):
+        # a user who just wrote keeps reading from the primary until a replica has caught up
+        if g.pop('db_wrote', False) and app.config['READ_YOUR_WRITES_SECONDS']:
+            session['primary_until'] = time.time() + app.config['READ_YOUR_WRITES_SECONDS']
+        return response
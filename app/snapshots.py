@@ -0,0 +1,72 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from app import db
+from app.models import StockCheckpoint
+from app.stock import LEDGERS, SNAPSHOTS, ledger_balances
+
+
+def day_end(day):
+    return datetime.combine(day + timedelta(days=1), time.min)
+
+
+def month_ends(first, last):
+    day = date(first.year, first.month, 1)
+    while True:
+        following = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+        if following - timedelta(days=1) > last:
+            return
+        yield following - timedelta(days=1)
+        day = following
+
+
+def nearest_checkpoint(day, inclusive=True):
+    query = StockCheckpoint.query.filter(StockCheckpoint.date <= day if inclusive else StockCheckpoint.date < day)
+    return query.order_by(StockCheckpoint.date.desc()).first()
+
+
+def balances_as_of(model, day, inclusive=True):
+    # closing balances of `day`: the nearest earlier snapshot plus only the movements after it
+    balance, item_key = LEDGERS[model]
+    snapshot = SNAPSHOTS[model]
+    totals = defaultdict(int)
+    since = None
+    checkpoint = nearest_checkpoint(day, inclusive)
+    if checkpoint is not None:
+        totals.update(((item, office), amount) for item, office, amount in
+                      db.session.query(getattr(snapshot, item_key), snapshot.office, snapshot.amount)
+                      .filter(snapshot.checkpoint == checkpoint.id))
+        since = day_end(checkpoint.date)
+    for key, delta in ledger_balances(model, since, day_end(day)).items():
+        totals[key] += delta
+    return totals
+
+
+def create_checkpoint(day):
+    checkpoint = StockCheckpoint.query.filter_by(date=day).first()
+    if checkpoint is None:
+        checkpoint = StockCheckpoint(date=day)
+        db.session.add(checkpoint)
+        db.session.flush()
+    checkpoint.created = datetime.now()
+    for model, snapshot in SNAPSHOTS.items():
+        item_key = LEDGERS[model][1]
+        snapshot.query.filter_by(checkpoint=checkpoint.id).delete()
+        db.session.bulk_insert_mappings(snapshot, [
+            {'checkpoint': checkpoint.id, item_key: item, 'office': office, 'amount': amount}
+            for (item, office), amount in balances_as_of(model, day, inclusive=False).items() if amount])
+    db.session.commit()
+    return checkpoint
+
+
+def first_movement_day():
+    dates = [db.session.query(db.func.min(model.date)).scalar() for model in LEDGERS]
+    dates = [value for value in dates if value is not None]
+    return min(dates).date() if dates else None
+
+
+def create_monthly_checkpoints(until):
+    first = first_movement_day()
+    if first is None:
+        return []
+    existing = {value for value, in db.session.query(StockCheckpoint.date)}
+    return [create_checkpoint(day) for day in month_ends(first, until) if day not in existing]
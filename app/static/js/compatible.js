@@ -0,0 +1,24 @@
+$(function() {
+    var $form = $("#cartridge_stock_form");
+    var $office = $form.find("#office");
+    var $inOut = $form.find("#in_out");
+    var $cartridge = $form.find("#cartridge");
+
+    //Narrow the cartridge list to the models the selected office can use
+    function refreshCartridges() {
+        $.getJSON($form.data("choices-url"), {office: $office.val(), in_out: $inOut.val()}, function(data) {
+            var selected = $cartridge.val();
+            $cartridge.empty();
+            $.each(data.cartridges, function(i, cartridge) {
+                $cartridge.append($("<option>").val(cartridge.id).text(cartridge.label));
+            });
+            $cartridge.val(selected);
+            if ($cartridge.val() === null) {
+                $cartridge.prop("selectedIndex", 0);
+            }
+        });
+    }
+
+    $office.change(refreshCartridges);
+    $inOut.change(refreshCartridges);
+});
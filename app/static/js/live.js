@@ -0,0 +1,34 @@
+$(function() {
+    var $live = $("#live");
+    var levelColors = {ok: "green", low: "yellow", critical: "red"};
+    if (!$live.length || !window.EventSource) {
+        return;
+    }
+    var source = new EventSource($live.data("events-url"));
+
+    //Rows come oldest first: each goes right under the header, so the newest ends on top
+    source.addEventListener("movements", function(event) {
+        var data = JSON.parse(event.data);
+        $.each(data.rows, function(i, row) {
+            var $ledger = $(".ledger[data-item-type='" + row[1] + "']");
+            if ($ledger.find("tr[data-id='" + row[0] + "']").length) {
+                return;
+            }
+            var $row = $("<tr>").attr("data-id", row[0]);
+            $.each(row.slice(2), function(j, value) {
+                $row.append($("<td>").text(value === null ? "" : value));
+            });
+            $ledger.find("tr.ledger-header").after($row);
+        });
+        $.each(data.balances, function(i, balance) {
+            $(".ledger[data-item-type='" + balance[0] + "'] [data-balance='" + balance[1] + "']")
+                .text(balance[2]).attr("color", levelColors[balance[3]]);
+        });
+    });
+
+    //History or the catalog changed under the page
+    source.addEventListener("reset", function() {
+        source.close();
+        location.reload();
+    });
+});
@@ -0,0 +1,352 @@
+import random
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, func, inspect
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import StockMovement, CartridgeStock, PrinterStock, CartridgeBalance, PrinterBalance, StockCheckpoint, \
+    CartridgeSnapshot, PrinterSnapshot, LedgerVersion, LedgerSequence, CartridgeOpening, PrinterOpening, LedgerArchive, bump_version
+from app.catalog import catalog, compatible_cartridges
+from app.alerts import check_levels
+
+# ledger model -> (balance model, item type); both ledgers share the stock_movement table
+LEDGERS = {
+    CartridgeStock: (CartridgeBalance, 'cartridge'),
+    PrinterStock: (PrinterBalance, 'printer'),
+}
+LEDGERS_BY_BALANCE = {balance: item_key for balance, item_key in LEDGERS.values()}
+SNAPSHOTS = {
+    CartridgeStock: CartridgeSnapshot,
+    PrinterStock: PrinterSnapshot,
+}
+LEDGERS_BY_ITEM = {item_key: ledger for ledger, (balance, item_key) in LEDGERS.items()}
+OPENINGS = {
+    CartridgeStock: CartridgeOpening,
+    PrinterStock: PrinterOpening,
+}
+# the name a ledger is known by outside the ORM: its compatibility view, exports and archives
+LEDGER_NAMES = {
+    CartridgeStock: 'cartridge_stock',
+    PrinterStock: 'printer_stock',
+}
+MOVEMENT_FIELDS = ('office', 'in_out', 'amount')
+
+Movement = namedtuple('Movement', 'ledger item office in_out amount')
+
+# yearly archive tables live outside db.metadata: create_all and migrations leave them alone
+archive_metadata = db.MetaData()
+
+
+def warehouse_id():
+    return current_app.config['WAREHOUSE_OFFICE_ID']
+
+
+def movement_deltas(item, office, in_out, amount, warehouse):
+    # Receipts always add to the warehouse stock. An issue takes items out of the
+    # warehouse and books them against the receiving office.
+    if item is None or in_out is None or not amount:
+        return []
+    if in_out:
+        return [(item, warehouse, amount)]
+    deltas = [(item, warehouse, -amount)]
+    if office is not None and office != warehouse:
+        deltas.append((item, office, amount))
+    return deltas
+
+
+def _committed_value(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _record_deltas(record, warehouse, committed=False):
+    keys = ('item_id',) + MOVEMENT_FIELDS
+    if committed:
+        state = inspect(record)
+        values = [_committed_value(state, key) for key in keys]
+    else:
+        values = [getattr(record, key) for key in keys]
+    return movement_deltas(*values, warehouse=warehouse)
+
+
+class StaleBalance(Exception):
+    pass
+
+
+def apply_deltas(session, deltas, versions=None):
+    # Every update bumps the row version. A balance read with its version (see
+    # write_movements) is only updated if nobody else has written it since.
+    warehouse = warehouse_id()
+    versions = versions or {}
+    # a stable order keeps concurrent writers from locking balance rows in opposite order
+    for (balance, item, office), delta in sorted(deltas.items(), key=lambda d: (d[0][0].__tablename__,) + d[0][1:]):
+        if not delta:
+            continue
+        table = balance.__table__
+        item_key = LEDGERS_BY_BALANCE[balance]
+        update = table.update().where(table.c[item_key] == item).where(table.c.office == office)
+        if (balance, item, office) in versions:
+            update = update.where(table.c.version == versions[(balance, item, office)])
+        result = session.execute(update.values(amount=table.c.amount + delta, version=table.c.version + 1))
+        if result.rowcount == 0:
+            if (balance, item, office) in versions:
+                raise StaleBalance(balance, item, office)
+            try:
+                session.execute(table.insert().values({item_key: item, 'office': office, 'amount': delta,
+                                                       'version': 1}))
+            except IntegrityError:
+                # a concurrent writer created the row first: start over like any stale read
+                raise StaleBalance(balance, item, office)
+    check_levels(session, {(balance, item): delta for (balance, item, office), delta in deltas.items()
+                           if office == warehouse})
+
+
+def invalidate_checkpoints(session, since):
+    # a movement dated on or before a checkpoint makes that snapshot and every later one stale
+    checkpoints = StockCheckpoint.__table__
+    stale = [id for id, in session.execute(db.select([checkpoints.c.id]).where(checkpoints.c.date >= since))]
+    if not stale:
+        return
+    for snapshot in SNAPSHOTS.values():
+        session.execute(snapshot.__table__.delete().where(snapshot.__table__.c.checkpoint.in_(stale)))
+    session.execute(checkpoints.delete().where(checkpoints.c.id.in_(stale)))
+
+
+@event.listens_for(db.session, 'before_flush')
+def sequence_movements(session, flush_context, instances):
+    # movements added through the ORM take a new ledger sequence like write_movements
+    if any(isinstance(record, StockMovement) for record in session.new):
+        bump_version(session, LedgerSequence)
+
+
+@event.listens_for(db.session, 'after_flush')
+def update_balances(session, flush_context):
+    records = [(record, 1, False) for record in session.new if type(record) in LEDGERS]
+    records += [(record, -1, True) for record in session.deleted if type(record) in LEDGERS]
+    for record in session.dirty:
+        if type(record) in LEDGERS and session.is_modified(record):
+            records += [(record, -1, True), (record, 1, False)]
+    if not records:
+        return
+    if any(committed for record, sign, committed in records):
+        # edits and deletes rewrite history; appends are picked up by id
+        bump_version(session, LedgerVersion)
+    warehouse = warehouse_id()
+    deltas = defaultdict(int)
+    for record, sign, committed in records:
+        balance = LEDGERS[type(record)][0]
+        for item, office, amount in _record_deltas(record, warehouse, committed):
+            deltas[(balance, item, office)] += sign * amount
+    apply_deltas(session, deltas)
+    dates = [record.date if not committed else _committed_value(inspect(record), 'date')
+             for record, sign, committed in records]
+    dates = [date for date in dates if date is not None]
+    if dates:
+        invalidate_checkpoints(session, min(dates).date())
+
+
+def archive_table(model, year):
+    # archives keep the layout of the old per-ledger tables, the same as the compatibility views
+    name = '{}_{}'.format(LEDGER_NAMES[model], year)
+    if name not in archive_metadata.tables:
+        db.Table(name, archive_metadata,
+                 db.Column('id', db.Integer, primary_key=True),
+                 db.Column('date', db.DateTime),
+                 db.Column('in_out', db.Boolean),
+                 db.Column('office', db.Integer),
+                 db.Column(LEDGERS[model][1], db.Integer),
+                 db.Column('amount', db.Integer),
+                 db.Column('user_id', db.Integer),
+                 db.Index('ix_{}_date'.format(name), 'date'))
+    return archive_metadata.tables[name]
+
+
+def archived_years(model):
+    return [year for year, in db.session.query(LedgerArchive.year)
+            .filter_by(ledger=LEDGER_NAMES[model]).order_by(LedgerArchive.year)]
+
+
+def archive_cutoff(model):
+    return db.session.query(func.max(OPENINGS[model].date)).scalar()
+
+
+def ledger_totals_query(model, since=None, until=None, source=None):
+    source = model if source is None else source
+    item_column = getattr(source, LEDGERS[model][1])
+    rows = db.session.query(item_column, source.office, source.in_out, func.sum(source.amount))
+    if since is not None:
+        rows = rows.filter(source.date >= since)
+    if until is not None:
+        rows = rows.filter(source.date < until)
+    return rows.group_by(item_column, source.office, source.in_out)
+
+
+def ledger_balances(model, since=None, until=None):
+    # Movements before the archive cut-off are carried by the opening balances. Only a
+    # window that reaches back before the cut-off has to read the yearly archives.
+    warehouse = warehouse_id()
+    totals = defaultdict(int)
+    rows = list(ledger_totals_query(model, since, until))
+    cutoff = archive_cutoff(model)
+    if cutoff is not None and since is None and (until is None or until >= cutoff):
+        opening = OPENINGS[model]
+        for item, office, amount in db.session.query(getattr(opening, LEDGERS[model][1]), opening.office,
+                                                     opening.amount):
+            totals[(item, office)] += amount
+    elif cutoff is not None and (since is None or since < cutoff):
+        for year in archived_years(model):
+            if (since is None or since < datetime(year + 1, 1, 1)) and (until is None or until > datetime(year, 1, 1)):
+                rows += ledger_totals_query(model, since, until, archive_table(model, year).c)
+    for item, office, in_out, amount in rows:
+        for key_item, key_office, delta in movement_deltas(item, office, in_out, amount, warehouse):
+            totals[(key_item, key_office)] += delta
+    return totals
+
+
+def rebuild_balances():
+    for model, (balance, item_key) in LEDGERS.items():
+        totals = ledger_balances(model)
+        db.session.query(balance).delete(synchronize_session=False)
+        db.session.bulk_insert_mappings(balance, [{item_key: item, 'office': office, 'amount': amount}
+                                                  for (item, office), amount in totals.items()])
+    db.session.commit()
+
+
+def verify_balances():
+    mismatches = []
+    for model, (balance, item_key) in LEDGERS.items():
+        expected = ledger_balances(model)
+        stored = {(item, office): amount for item, office, amount in
+                  db.session.query(getattr(balance, item_key), balance.office, balance.amount)}
+        for item, office in sorted(set(expected) | set(stored)):
+            if expected.get((item, office), 0) != stored.get((item, office), 0):
+                mismatches.append((balance.__tablename__, item, office,
+                                   expected.get((item, office), 0), stored.get((item, office))))
+    return mismatches
+
+
+def stock_on_hand(balance, item_id, office=None):
+    item_column = getattr(balance, LEDGERS_BY_BALANCE[balance])
+    amount = db.session.query(balance.amount) \
+        .filter(item_column == item_id, balance.office == (office or warehouse_id())).scalar()
+    return amount or 0
+
+
+def warehouse_levels(balance, item_ids):
+    return {item: amount for item, (amount, version) in warehouse_versions(balance, item_ids).items()}
+
+
+def warehouse_versions(balance, item_ids):
+    item_column = getattr(balance, LEDGERS_BY_BALANCE[balance])
+    if not item_ids:
+        return {}
+    return {item: (amount, version) for item, amount, version in
+            db.session.query(item_column, balance.amount, balance.version)
+            .filter(item_column.in_(item_ids), balance.office == warehouse_id())}
+
+
+def movement_error(movement, on_hand):
+    if movement.in_out:
+        if movement.office != warehouse_id():
+            return 'Items can only be received at the warehouse.'
+        return None
+    if movement.ledger is CartridgeStock and movement.item not in compatible_cartridges(movement.office):
+        return 'The cartridge does not fit any printer of the office.'
+    if movement.amount >= on_hand:
+        return 'Not enough items in stock.'
+    return None
+
+
+def parse_movement(line):
+    if not isinstance(line, dict):
+        raise ValueError('A movement must be an object.')
+    item_keys = [key for key in LEDGERS_BY_ITEM if key in line]
+    if len(item_keys) != 1:
+        raise ValueError('A movement needs exactly one of: {}.'.format(', '.join(sorted(LEDGERS_BY_ITEM))))
+    item_key = item_keys[0]
+    item, office, in_out, amount = line[item_key], line.get('office'), line.get('in_out'), line.get('amount')
+    if item not in {entry.id for entry in catalog(item_key)}:
+        raise ValueError('Unknown {}.'.format(item_key))
+    if office not in {entry.id for entry in catalog('office')}:
+        raise ValueError('Unknown office.')
+    if not isinstance(in_out, bool):
+        raise ValueError('"in_out" must be true or false.')
+    if isinstance(amount, bool) or not isinstance(amount, int) or amount < 1:
+        raise ValueError('"amount" must be a positive integer.')
+    return Movement(LEDGERS_BY_ITEM[item_key], item, office, in_out, amount)
+
+
+def _plan_movements(movements, user_id, date):
+    # Lines are checked in order against the running balances, so a receipt earlier in
+    # the batch can cover an issue later on.
+    warehouse = warehouse_id()
+    on_hand, versions = {}, {}
+    for ledger, (balance, item_key) in LEDGERS.items():
+        items = {movement.item for _, movement in movements if movement.ledger is ledger}
+        for item, (amount, version) in warehouse_versions(balance, items).items():
+            on_hand[(ledger, item)] = amount
+            versions[(balance, item, warehouse)] = version
+    results, rows, deltas = [], [], defaultdict(int)
+    for index, movement in movements:
+        ledger = movement.ledger
+        balance, item_key = LEDGERS[ledger]
+        error = movement_error(movement, on_hand.get((ledger, movement.item), 0))
+        if error:
+            results.append({'line': index, 'status': 'error', 'error': error})
+            continue
+        rows.append({'date': date, 'item_type': item_key, 'item_id': movement.item, 'office': movement.office,
+                     'in_out': movement.in_out, 'amount': movement.amount, 'user_id': user_id})
+        for item, office, amount in movement_deltas(*movement[1:], warehouse=warehouse):
+            deltas[(balance, item, office)] += amount
+            if office == warehouse:
+                on_hand[(ledger, item)] = on_hand.get((ledger, item), 0) + amount
+        results.append({'line': index, 'status': 'ok'})
+    # only balances an issue was checked against need to be unchanged when written
+    versions = {key: version for key, version in versions.items() if deltas.get(key, 0) < 0}
+    return results, rows, deltas, versions
+
+
+def write_movements(movements, user_id):
+    # Optimistic concurrency: the balances are read with their versions, and the
+    # conditional updates fail if another writer got in between. The whole batch is
+    # then rolled back and checked again against the new balances. Writers of
+    # different items never wait for each other.
+    for attempt in range(current_app.config['STOCK_WRITE_RETRIES']):
+        date = datetime.now()
+        results, rows, deltas, versions = _plan_movements(movements, user_id, date)
+        try:
+            apply_deltas(db.session, deltas, versions)
+        except StaleBalance:
+            db.session.rollback()
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+            continue
+        if rows:
+            invalidate_checkpoints(db.session, date.date())
+            # The one lock every writer shares: appends commit one after another, which is
+            # what lets readers follow them by sequence. Taken last, it is held only for
+            # the insert and the commit (see benchmarks/writers.py).
+            bump_version(db.session, LedgerSequence)
+            db.session.execute(StockMovement.__table__.insert(), rows)
+        db.session.commit()
+        return results
+    return [{'line': index, 'status': 'error', 'error': 'The stock is busy, please try again.'}
+            for index, movement in movements]
+
+
+def record_movements(lines, user_id):
+    # Invalid lines are reported and skipped; valid ones are written with a single
+    # executemany, whatever ledger they belong to.
+    results, movements = [], []
+    for index, line in enumerate(lines):
+        try:
+            movements.append((index, parse_movement(line)))
+        except ValueError as error:
+            results.append({'line': index, 'status': 'error', 'error': str(error)})
+    results += write_movements(movements, user_id) if movements else []
+    return sorted(results, key=lambda result: result['line'])
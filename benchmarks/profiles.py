@@ -0,0 +1,109 @@
+"""Throughput of the dashboard and the stock posts under each config profile.
+
+"legacy" is the configuration from before APP_PROFILE: every statement echoed,
+a rollback journal with full syncs and debug logging. Each profile gets its
+own seeded SQLite file, and the routes are driven through the Flask test
+client:
+
+    python benchmarks/profiles.py --profiles legacy,prod --requests 300
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import PROFILES, DevelopmentConfig  # noqa: E402
+from seed import seed, BENCH_USER  # noqa: E402
+from routes import issue_targets  # noqa: E402
+
+
+class LegacyConfig(DevelopmentConfig):
+    SQLALCHEMY_ECHO = True
+    SQLALCHEMY_BINDS = {}
+    SQLITE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+    LOG_LEVEL = 'DEBUG'
+    SQL_LOG_SAMPLE_RATE = 0
+
+
+def profile_config(name, path):
+    base = LegacyConfig if name == 'legacy' else PROFILES[name]
+
+    class BenchmarkConfig(base):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(path)
+        SQLALCHEMY_BINDS = {'read': SQLALCHEMY_DATABASE_URI} if base.SQLALCHEMY_BINDS else {}
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        WTF_CSRF_ENABLED = False
+    return BenchmarkConfig
+
+
+def scenarios(targets):
+    return [
+        ('dashboard', 'GET', '/', None),
+        ('cartridge_issue', 'POST', '/cartridgestock', {'office': targets['cartridge_office'],
+                                                        'cartridge': targets['cartridge'], 'in_out': 'False',
+                                                        'amount': 1}),
+        ('printer_issue', 'POST', '/printerstock', {'office': targets['printer_office'],
+                                                    'printer': targets['printer'], 'in_out': 'False', 'amount': 1}),
+    ]
+
+
+def throughput(client, method, url, data, requests):
+    client.open(url, method=method, data=data)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.open(url, method=method, data=data)
+    elapsed = time.perf_counter() - start
+    return {'status': response.status_code, 'requests': requests, 'requests_per_second': requests / elapsed}
+
+
+def run_profile(name, directory, dataset, requests):
+    from app import create_app
+    path = os.path.join(directory, 'profile_{}.db'.format(name))
+    seed(path, **dataset)
+    app = create_app(profile_config(name, path))
+    logging.getLogger().setLevel(app.config['LOG_LEVEL'])
+    targets = issue_targets(app)
+    client = app.test_client()
+    client.post('/login', data={'username': BENCH_USER[0], 'password': BENCH_USER[1]})
+    return {scenario: throughput(client, method, url, data, requests)
+            for scenario, method, url, data in scenarios(targets)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default='legacy,dev,prod',
+                        help='comma separated, from: legacy, ' + ', '.join(PROFILES))
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=10000, help='cartridge ledger rows to seed')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+    profiles = [profile.strip() for profile in args.profiles.split(',') if profile.strip()]
+    unknown = set(profiles) - set(PROFILES) - {'legacy'}
+    if unknown:
+        parser.error('unknown profiles: {}'.format(', '.join(sorted(unknown))))
+    dataset = {'offices': 20, 'printers': 40, 'cartridges': 30, 'rows': args.rows}
+    results = {}
+    with open(os.devnull, 'w') as devnull, tempfile.TemporaryDirectory() as directory:
+        # echoed statements and debug logs are part of the cost, not of the output
+        logging.basicConfig(stream=devnull)
+        for profile in profiles:
+            with contextlib.redirect_stdout(devnull):
+                results[profile] = run_profile(profile, directory, dataset, args.requests)
+            print('{:7} '.format(profile) + '  '.join(
+                '{} {:7.1f} req/s'.format(scenario, measured['requests_per_second'])
+                for scenario, measured in results[profile].items()))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Latency, query count and peak memory of the hot routes at several data sizes.
+
+Each size is seeded with benchmarks/seed.py and every scenario is run against
+it through the Flask test client. Results go to a JSON file that can be
+diffed or compared across revisions:
+
+    python benchmarks/routes.py --sizes small,medium --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event  # noqa: E402
+from seed import seed, BENCH_USER  # noqa: E402
+
+SIZES = {
+    'small': {'offices': 10, 'printers': 20, 'cartridges': 15, 'rows': 2000},
+    'medium': {'offices': 50, 'printers': 100, 'cartridges': 80, 'rows': 50000},
+    'large': {'offices': 200, 'printers': 400, 'cartridges': 300, 'rows': 500000},
+}
+
+
+def scenarios(targets):
+    cartridge_issue = {'office': targets['cartridge_office'], 'cartridge': targets['cartridge'],
+                       'in_out': 'False', 'amount': 1}
+    printer_issue = {'office': targets['printer_office'], 'printer': targets['printer'], 'in_out': 'False',
+                     'amount': 1}
+    return [
+        ('dashboard', 'GET', '/', None),
+        ('dashboard_filtered', 'GET', '/?office={}'.format(targets['cartridge_office']), None),
+        ('cartridge_issue', 'POST', '/cartridgestock', cartridge_issue),
+        ('printer_issue', 'POST', '/printerstock', printer_issue),
+        ('cartridge_form', 'GET', '/cartridgestock', None),
+        ('printer_form', 'GET', '/printerstock', None),
+        ('add_office_form', 'GET', '/add_office', None),
+        ('admin_cartridge_stock', 'GET', '/admin/cartridgestock/', None),
+        ('admin_printer_stock', 'GET', '/admin/printerstock/', None),
+        ('admin_users', 'GET', '/admin/user/', None),
+        ('analytics', 'GET', '/analytics', None),
+        ('api_balances', 'GET', '/api/v1/balances/cartridge_stock', None),
+        ('api_ledger', 'GET', '/api/v1/ledger/cartridge_stock', None),
+    ]
+
+
+def issue_targets(app):
+    # the best stocked item of each ledger, so repeated issues keep succeeding
+    from app import db
+    from app.models import CartridgeBalance, PrinterBalance, Office
+    from app.catalog import compatible_cartridges
+    from app.stock import warehouse_id
+    with app.app_context():
+        warehouse = warehouse_id()
+        offices = [id for id, in db.session.query(Office.id).order_by(Office.id) if id != warehouse] or [warehouse]
+        fitting = {cartridge: office for office in reversed(offices) for cartridge in compatible_cartridges(office)}
+        cartridge = db.session.query(CartridgeBalance.cartridge) \
+            .filter(CartridgeBalance.office == warehouse, CartridgeBalance.cartridge.in_(fitting)) \
+            .order_by(CartridgeBalance.amount.desc()).first()[0]
+        printer = db.session.query(PrinterBalance.printer).filter_by(office=warehouse) \
+            .order_by(PrinterBalance.amount.desc()).first()[0]
+    return {'cartridge': cartridge, 'cartridge_office': fitting[cartridge], 'printer': printer,
+            'printer_office': offices[0]}
+
+
+def measure(app, client, method, url, data, repeat):
+    from app import db
+    counter = {'queries': 0}
+
+    def count(*args):
+        counter['queries'] += 1
+    engines = [db.get_engine(app, bind) for bind in [None] + list(app.config['SQLALCHEMY_BINDS'])]
+    for engine in engines:
+        event.listen(engine, 'after_cursor_execute', count)
+    try:
+        client.open(url, method=method, data=data)
+        counter['queries'] = 0
+        latencies = []
+        tracemalloc.start()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            latencies.append(time.perf_counter() - start)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        for engine in engines:
+            event.remove(engine, 'after_cursor_execute', count)
+    latencies.sort()
+    return {'method': method, 'url': url, 'status': response.status_code, 'repeat': repeat,
+            'median_ms': statistics.median(latencies) * 1000,
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+            'queries_per_request': counter['queries'] / float(repeat),
+            'peak_memory_kb': peak / 1024.0}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, seed_value, directory, only=None):
+    results = {'started': datetime.now().isoformat(), 'revision': git_revision(),
+               'python': platform.python_version(), 'seed': seed_value, 'repeat': repeat, 'sizes': {}}
+    for size in sizes:
+        path = os.path.join(directory, 'bench_{}_{}.db'.format(size, seed_value))
+        app = seed(path, seed=seed_value, **SIZES[size])
+        app.config['WTF_CSRF_ENABLED'] = False
+        client = app.test_client()
+        client.post('/login', data={'username': BENCH_USER[0], 'password': BENCH_USER[1]})
+        measured = {}
+        for name, method, url, data in scenarios(issue_targets(app)):
+            if only and name not in only:
+                continue
+            measured[name] = measure(app, client, method, url, data, repeat)
+            print('{:6} {:24} {:8.2f} ms {:6.1f} queries {:9.0f} KiB'.format(
+                size, name, measured[name]['median_ms'], measured[name]['queries_per_request'],
+                measured[name]['peak_memory_kb']))
+        results['sizes'][size] = {'dataset': SIZES[size], 'scenarios': measured}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='small,medium', help='comma separated, from: ' + ', '.join(SIZES))
+    parser.add_argument('--scenarios', help='comma separated scenario names, all by default')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--workdir', help='where the seeded databases are kept, a temporary directory by default')
+    args = parser.parse_args()
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        parser.error('unknown sizes: {}'.format(', '.join(sorted(unknown))))
+    only = set(args.scenarios.split(',')) if args.scenarios else None
+    if args.workdir:
+        results = run(sizes, args.repeat, args.seed, args.workdir, only)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = run(sizes, args.repeat, args.seed, directory, only)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+    print('Results written to {}.'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
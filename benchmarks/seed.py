@@ -0,0 +1,113 @@
+"""Fill a SQLite database with a deterministic catalog and stock ledger.
+
+The same arguments always produce the same rows, so benchmark runs against
+different revisions compare like with like:
+
+    python benchmarks/seed.py /tmp/it_store_bench.db --offices 50 --rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import TestingConfig  # noqa: E402
+
+COLORS = ('Black', 'Cyan', 'Magenta', 'Yellow')
+BRANDS = ('HP', 'Canon', 'Kyocera', 'Brother', 'Xerox')
+BENCH_USER = ('bench', 'bench')
+
+
+def database_config(path):
+    class BenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(path)
+        SQLALCHEMY_BINDS = {'read': SQLALCHEMY_DATABASE_URI}
+        ADMIN_ENABLED = True
+    return BenchmarkConfig
+
+
+def ledger_rows(rng, item_key, items, offices, compatible, warehouse, rows, user_id, start):
+    # a third of the rows are receipts at the warehouse, the rest issues of a few items each
+    step = timedelta(days=730) / max(rows, 1)
+    result = []
+    for number in range(rows):
+        date = start + step * number
+        if rng.random() < 1 / 3.0:
+            item, office, in_out, amount = rng.choice(items), warehouse, True, rng.randint(20, 50)
+        else:
+            office = rng.choice(offices)
+            item = rng.choice(compatible.get(office) or items)
+            in_out, amount = False, rng.randint(1, 3)
+        result.append({'date': date, 'item_type': item_key, 'item_id': item, 'office': office, 'in_out': in_out,
+                       'amount': amount, 'user_id': user_id})
+    return result
+
+
+def seed(path, offices=20, printers=40, cartridges=30, rows=10000, printer_rows=None, seed=1):
+    from app import create_app, db
+    from app.models import User, Role, Cartridge, Printer, Office, StockMovement, \
+        cartridges as cartridge_links, printers as printer_links
+    from app.stock import rebuild_balances
+
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    app = create_app(database_config(path))
+    with app.app_context():
+        db.create_all()
+        admin = Role(name='Admin')
+        user = User(username=BENCH_USER[0], email='bench@example.com', roles=[admin, Role(name='User')])
+        user.set_password(BENCH_USER[1])
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(Office.__table__.insert(), [
+            {'id': id, 'name': 'Warehouse' if id == 1 else 'Office {}'.format(id), 'place': 'Floor {}'.format(id % 9)}
+            for id in range(1, offices + 1)])
+        db.session.execute(Cartridge.__table__.insert(), [
+            {'id': id, 'cartridge_model': 'CRT-{:04d}'.format(id), 'color': rng.choice(COLORS)}
+            for id in range(1, cartridges + 1)])
+        db.session.execute(Printer.__table__.insert(), [
+            {'id': id, 'brand': rng.choice(BRANDS), 'printer_model': 'PRN-{:04d}'.format(id)}
+            for id in range(1, printers + 1)])
+        fits = {printer: rng.sample(range(1, cartridges + 1), min(cartridges, rng.randint(1, 3)))
+                for printer in range(1, printers + 1)}
+        db.session.execute(cartridge_links.insert(), [{'printer_id': printer, 'cartridge_id': cartridge}
+                                                      for printer, ids in fits.items() for cartridge in ids])
+        installed = {office: rng.sample(range(1, printers + 1), min(printers, rng.randint(1, 4)))
+                     for office in range(2, offices + 1)}
+        db.session.execute(printer_links.insert(), [{'office_id': office, 'printer_id': printer}
+                                                    for office, ids in installed.items() for printer in ids])
+        compatible = {office: sorted({cartridge for printer in ids for cartridge in fits[printer]})
+                      for office, ids in installed.items()}
+        warehouse = app.config['WAREHOUSE_OFFICE_ID']
+        start = datetime(2024, 1, 1)
+        office_ids = list(range(2, offices + 1)) or [warehouse]
+        db.session.execute(StockMovement.__table__.insert(), ledger_rows(
+            rng, 'cartridge', list(range(1, cartridges + 1)), office_ids, compatible, warehouse, rows, user.id, start))
+        db.session.execute(StockMovement.__table__.insert(), ledger_rows(
+            rng, 'printer', list(range(1, printers + 1)), office_ids, {}, warehouse,
+            rows // 10 if printer_rows is None else printer_rows, user.id, start))
+        db.session.commit()
+        rebuild_balances()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('database')
+    parser.add_argument('--offices', type=int, default=20)
+    parser.add_argument('--printers', type=int, default=40)
+    parser.add_argument('--cartridges', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=10000, help='cartridge ledger rows')
+    parser.add_argument('--printer-rows', type=int, help='printer ledger rows, a tenth of --rows by default')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    seed(args.database, args.offices, args.printers, args.cartridges, args.rows, args.printer_rows, args.seed)
+    print('Seeded {}.'.format(args.database))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Worker start-up time: importing the app, create_app() and the first request.
+
+Every sample runs in a fresh interpreter, as a new gunicorn worker or flask
+command would. Run from the repository root:
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'first_request': served - created}))
+'''
+
+
+def sample(env):
+    output = subprocess.run([sys.executable, '-c', SAMPLE], cwd=ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--profile', default='prod')
+    args = parser.parse_args()
+    for admin in ('1', '0'):
+        env = dict(os.environ, APP_PROFILE=args.profile, ADMIN_ENABLED=admin)
+        samples = [sample(env) for _ in range(args.runs)]
+        medians = {phase: statistics.median(run[phase] for run in samples) for phase in samples[0]}
+        print('admin {:3}  import {:6.1f} ms  create_app {:6.1f} ms  first request {:6.1f} ms  total {:6.1f} ms'.format(
+            'on' if admin == '1' else 'off', medians['import'] * 1000, medians['create_app'] * 1000,
+            medians['first_request'] * 1000, sum(medians.values()) * 1000))
+
+
+if __name__ == '__main__':
+    main()
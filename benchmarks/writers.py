@@ -0,0 +1,92 @@
+"""Throughput of concurrent stock writers that never touch the same item.
+
+Every thread receives its own cartridge, so balance rows never conflict and
+what is left to wait on is the database itself and the shared ledger sequence
+row. --no-sequence skips that row, for comparison only: the live feed and the
+incremental issue totals miss the rows it writes. SQLite serialises writers
+anyway; point --database-url at a server database to see what the sequence
+costs there:
+
+    python benchmarks/writers.py --threads 1,4,8 --writes 100
+    python benchmarks/writers.py --database-url postgresql://localhost/it_store_bench
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import TestingConfig  # noqa: E402
+
+
+def writers_config(url):
+    class WritersConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = url
+        SQLALCHEMY_BINDS = {}
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': 32} if not url.startswith('sqlite') else {}
+    return WritersConfig
+
+
+def run_writers(url, threads, writes, sequence):
+    from app import create_app, db, stock
+    from app.models import User, Cartridge, Office, CartridgeStock, LedgerSequence, bump_version
+    app = create_app(writers_config(url))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='writer', email='writer@example.com')
+        db.session.add_all([user, Office(name='Warehouse', place='Basement')])
+        db.session.add_all([Cartridge(cartridge_model='W-{}'.format(number), color='Black')
+                            for number in range(threads)])
+        db.session.commit()
+        cartridges = [id for id, in db.session.query(Cartridge.id).order_by(Cartridge.id)]
+        warehouse, user_id = app.config['WAREHOUSE_OFFICE_ID'], user.id
+    stock.bump_version = bump_version if sequence else \
+        lambda session, model: None if model is LedgerSequence else bump_version(session, model)
+    failed = []
+
+    def write(cartridge):
+        with app.app_context():
+            for _ in range(writes):
+                results = stock.write_movements([(0, stock.Movement(CartridgeStock, cartridge, warehouse, True, 1))],
+                                                user_id)
+                failed.extend(result for result in results if result['status'] != 'ok')
+            db.session.remove()
+    workers = [threading.Thread(target=write, args=(cartridge,)) for cartridge in cartridges]
+    try:
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        stock.bump_version = bump_version
+    return {'writes_per_second': threads * writes / elapsed, 'failed': len(failed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='a scratch database, emptied first; a temporary SQLite file by default')
+    parser.add_argument('--threads', default='1,4,8', help='comma separated writer counts')
+    parser.add_argument('--writes', type=int, default=100, help='movements written by each thread')
+    parser.add_argument('--no-sequence', action='store_true', help='also measure without the ledger sequence')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or 'sqlite:///' + os.path.join(directory, 'writers.db')
+        for threads in [int(count) for count in args.threads.split(',') if count.strip()]:
+            for sequence in (True, False) if args.no_sequence else (True,):
+                measured = run_writers(url, threads, args.writes, sequence)
+                print('{:2} writers {:16} {:7.1f} writes/s  {} failed'.format(
+                    threads, 'with sequence' if sequence else 'without sequence',
+                    measured['writes_per_second'], measured['failed']))
+
+
+if __name__ == '__main__':
+    main()
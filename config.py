@@ -1,4 +1,4 @@
-import os, logging
+import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
@@ -6,7 +6,81 @@ class Config(object):
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'vnkdjnfjknfl1673#'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = True
-    SQLALCHEMY_ECHO = True
-    logging.basicConfig(level=logging.DEBUG)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = False
+    # pool settings only apply to server databases, SQLite is tuned with pragmas on connect
+    SQLALCHEMY_ENGINE_OPTIONS = {} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {
+        'pool_size': int(os.environ.get('DATABASE_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW') or 20),
+        'pool_recycle': int(os.environ.get('DATABASE_POOL_RECYCLE') or 1800),
+        'pool_pre_ping': True,
+    }
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'busy_timeout': 5000, 'synchronous': 'NORMAL'}
+    # Read-only pages and reports run on the "read" bind: a replica given by READ_DATABASE_URL,
+    # or a second, query-only engine on the same file for SQLite. Without one everything
+    # runs on the primary.
+    READ_DATABASE_URL = os.environ.get('READ_DATABASE_URL') or \
+        (SQLALCHEMY_DATABASE_URI if SQLALCHEMY_DATABASE_URI.startswith('sqlite:///') else None)
+    SQLALCHEMY_BINDS = {'read': READ_DATABASE_URL} if READ_DATABASE_URL else {}
+    SQLITE_READ_PRAGMAS = dict(SQLITE_PRAGMAS, query_only=1)
+    # after a write the user's requests stay on the primary for this long
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS') or 10)
+    ROLE_CACHE_SECONDS = int(os.environ.get('ROLE_CACHE_SECONDS') or 60)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    # statements slower than this are always logged, the rest only in the given share
+    SQL_SLOW_QUERY_SECONDS = float(os.environ.get('SQL_SLOW_QUERY_SECONDS') or 0.5)
+    SQL_LOG_SAMPLE_RATE = float(os.environ.get('SQL_LOG_SAMPLE_RATE') or 0)
+    # requests running more statements than this are logged, 0 turns the check off
+    SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET') or 25)
     FLASK_ADMIN_SWATCH = 'cerulean'
+    ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', '1') != '0'
+    STOCK_BATCH_LIMIT = int(os.environ.get('STOCK_BATCH_LIMIT') or 1000)
+    STOCK_WRITE_RETRIES = int(os.environ.get('STOCK_WRITE_RETRIES') or 10)
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE') or 1000)
+    LEDGER_PAGE_SIZE = int(os.environ.get('LEDGER_PAGE_SIZE') or 50)
+    API_PAGE_LIMIT = int(os.environ.get('API_PAGE_LIMIT') or 1000)
+    # smaller JSON bodies are not worth compressing
+    API_GZIP_MIN_SIZE = int(os.environ.get('API_GZIP_MIN_SIZE') or 500)
+    API_GZIP_LEVEL = int(os.environ.get('API_GZIP_LEVEL') or 6)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 200)
+    # Live dashboard: each open page holds a worker thread, so run a threaded or async
+    # server. Writes of other processes show up after at most one poll.
+    LIVE_POLL_SECONDS = float(os.environ.get('LIVE_POLL_SECONDS') or 1)
+    LIVE_KEEPALIVE_SECONDS = int(os.environ.get('LIVE_KEEPALIVE_SECONDS') or 15)
+    # a bigger batch makes the pages reload instead
+    LIVE_BATCH_LIMIT = int(os.environ.get('LIVE_BATCH_LIMIT') or 200)
+    LIVE_BUFFER_SIZE = int(os.environ.get('LIVE_BUFFER_SIZE') or 100)
+    CONSUMPTION_WINDOWS = (30, 90, 365)
+    FORECAST_WINDOW = 90
+    LEDGER_RETENTION_DAYS = int(os.environ.get('LEDGER_RETENTION_DAYS') or 730)
+    REORDER_LEAD_DAYS = int(os.environ.get('REORDER_LEAD_DAYS') or 14)
+    REORDER_COVER_DAYS = int(os.environ.get('REORDER_COVER_DAYS') or 60)
+    # default (warning, critical) stock levels, per model they can be changed in the admin panel
+    STOCK_LEVELS = {'cartridge': (10, 5), 'printer': (2, 2)}
+    STOCK_ALERT_FILE = os.environ.get('STOCK_ALERT_FILE')
+    WAREHOUSE_OFFICE_ID = int(os.environ.get('WAREHOUSE_OFFICE_ID') or 1)
+
+
+class DevelopmentConfig(Config):
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'DEBUG'
+    SQL_LOG_SAMPLE_RATE = float(os.environ.get('SQL_LOG_SAMPLE_RATE') or 1)
+
+
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_BINDS = {}
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'WARNING'
+
+
+class ProductionConfig(Config):
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'WARNING'
+
+
+PROFILES = {
+    'dev': DevelopmentConfig,
+    'test': TestingConfig,
+    'prod': ProductionConfig,
+}
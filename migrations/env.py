@@ -1,6 +1,7 @@
 from __future__ import with_statement
 
 import logging
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -33,6 +34,14 @@ target_metadata = current_app.extensions['migrate'].db.metadata
 # ... etc.
 
 
+# yearly ledger archives are created by `flask archive run`, not by migrations
+ARCHIVE_TABLE = re.compile(r'^\w+_stock_\d{4}$')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == 'table' and reflected and compare_to is None and ARCHIVE_TABLE.match(name))
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -83,6 +92,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
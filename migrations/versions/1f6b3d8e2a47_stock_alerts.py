@@ -0,0 +1,45 @@
+"""stock alerts
+
+Revision ID: 1f6b3d8e2a47
+Revises: e7a25b9f3c14
+Create Date: 2026-10-18 13:05:33.904127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f6b3d8e2a47'
+down_revision = 'e7a25b9f3c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('cartridge', sa.Column('warning_level', sa.Integer(), nullable=True))
+    op.add_column('cartridge', sa.Column('critical_level', sa.Integer(), nullable=True))
+    op.add_column('printer', sa.Column('warning_level', sa.Integer(), nullable=True))
+    op.add_column('printer', sa.Column('critical_level', sa.Integer(), nullable=True))
+    op.create_table('stock_alert',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=True),
+    sa.Column('item_type', sa.String(length=20), nullable=True),
+    sa.Column('item', sa.Integer(), nullable=True),
+    sa.Column('previous_level', sa.String(length=10), nullable=True),
+    sa.Column('level', sa.String(length=10), nullable=True),
+    sa.Column('amount', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_alert_date'), 'stock_alert', ['date'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stock_alert_date'), table_name='stock_alert')
+    op.drop_table('stock_alert')
+    with op.batch_alter_table('printer') as batch_op:
+        batch_op.drop_column('critical_level')
+        batch_op.drop_column('warning_level')
+    with op.batch_alter_table('cartridge') as batch_op:
+        batch_op.drop_column('critical_level')
+        batch_op.drop_column('warning_level')
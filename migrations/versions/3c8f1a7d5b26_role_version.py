@@ -0,0 +1,29 @@
+"""role version
+
+Revision ID: 3c8f1a7d5b26
+Revises: a52d7c9e1b38
+Create Date: 2026-10-18 18:12:40.731152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8f1a7d5b26'
+down_revision = 'a52d7c9e1b38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    role_version = op.create_table('role_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(role_version, [{'id': 1, 'generation': 0}])
+
+
+def downgrade():
+    op.drop_table('role_version')
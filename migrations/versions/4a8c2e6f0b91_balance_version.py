@@ -0,0 +1,28 @@
+"""balance version
+
+Revision ID: 4a8c2e6f0b91
+Revises: 1f6b3d8e2a47
+Create Date: 2026-10-18 13:48:12.520316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8c2e6f0b91'
+down_revision = '1f6b3d8e2a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('cartridge_balance', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('printer_balance', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('printer_balance') as batch_op:
+        batch_op.drop_column('version')
+    with op.batch_alter_table('cartridge_balance') as batch_op:
+        batch_op.drop_column('version')
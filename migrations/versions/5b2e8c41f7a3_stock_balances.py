@@ -0,0 +1,61 @@
+"""stock balances
+
+Revision ID: 5b2e8c41f7a3
+Revises: d447d6510b87
+Create Date: 2026-10-18 09:12:41.508312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8c41f7a3'
+down_revision = 'd447d6510b87'
+branch_labels = None
+depends_on = None
+
+WAREHOUSE_OFFICE_ID = 1
+
+
+def upgrade():
+    op.create_table('cartridge_balance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cartridge', sa.Integer(), nullable=False),
+    sa.Column('office', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['cartridge'], ['cartridge.id'], ),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cartridge', 'office', name='uq_cartridge_balance_cartridge_office')
+    )
+    op.create_table('printer_balance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('printer', sa.Integer(), nullable=False),
+    sa.Column('office', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.ForeignKeyConstraint(['printer'], ['printer.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('printer', 'office', name='uq_printer_balance_printer_office')
+    )
+    # fill the balances from the existing ledgers, same rules as `flask balances rebuild`
+    for ledger, item in (('cartridge_stock', 'cartridge'), ('printer_stock', 'printer')):
+        op.execute(
+            'INSERT INTO {item}_balance ({item}, office, amount) '
+            'SELECT {item}, {warehouse}, SUM(CASE WHEN in_out THEN amount ELSE -amount END) FROM {ledger} '
+            'WHERE {item} IS NOT NULL AND in_out IS NOT NULL AND amount IS NOT NULL '
+            'GROUP BY {item}'.format(item=item, ledger=ledger, warehouse=WAREHOUSE_OFFICE_ID)
+        )
+        op.execute(
+            'INSERT INTO {item}_balance ({item}, office, amount) '
+            'SELECT {item}, office, SUM(amount) FROM {ledger} '
+            'WHERE {item} IS NOT NULL AND NOT in_out AND amount IS NOT NULL '
+            'AND office IS NOT NULL AND office != {warehouse} '
+            'GROUP BY {item}, office'.format(item=item, ledger=ledger, warehouse=WAREHOUSE_OFFICE_ID)
+        )
+
+
+def downgrade():
+    op.drop_table('printer_balance')
+    op.drop_table('cartridge_balance')
@@ -0,0 +1,56 @@
+"""ledger archive
+
+Revision ID: 6e0c94a2d8f3
+Revises: b93d7f15c6e0
+Create Date: 2026-10-18 15:21:06.731954
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e0c94a2d8f3'
+down_revision = 'b93d7f15c6e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cartridge_opening',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.Column('cartridge', sa.Integer(), nullable=False),
+    sa.Column('office', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['cartridge'], ['cartridge.id'], ),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cartridge', 'office', name='uq_cartridge_opening_cartridge_office')
+    )
+    op.create_table('printer_opening',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.Column('printer', sa.Integer(), nullable=False),
+    sa.Column('office', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.ForeignKeyConstraint(['printer'], ['printer.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('printer', 'office', name='uq_printer_opening_printer_office')
+    )
+    op.create_table('ledger_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ledger', sa.String(length=32), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('updated', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ledger', 'year', name='uq_ledger_archive_ledger_year')
+    )
+
+
+def downgrade():
+    op.drop_table('ledger_archive')
+    op.drop_table('printer_opening')
+    op.drop_table('cartridge_opening')
@@ -0,0 +1,24 @@
+"""stock movement item index
+
+Revision ID: 7d2b9e4f1c63
+Revises: 3c8f1a7d5b26
+Create Date: 2026-10-18 18:40:05.114927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b9e4f1c63'
+down_revision = '3c8f1a7d5b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_stock_movement_item_date', 'stock_movement', ['item_type', 'item_id', 'date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stock_movement_item_date', table_name='stock_movement')
@@ -0,0 +1,29 @@
+"""catalog version
+
+Revision ID: 8d41c7e2a9b0
+Revises: 5b2e8c41f7a3
+Create Date: 2026-10-18 10:02:17.216604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41c7e2a9b0'
+down_revision = '5b2e8c41f7a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalog_version, [{'id': 1, 'generation': 0}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
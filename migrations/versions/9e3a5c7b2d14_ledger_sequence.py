@@ -0,0 +1,52 @@
+"""ledger sequence
+
+Revision ID: 9e3a5c7b2d14
+Revises: 7d2b9e4f1c63
+Create Date: 2026-10-18 20:12:37.402158
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3a5c7b2d14'
+down_revision = '7d2b9e4f1c63'
+branch_labels = None
+depends_on = None
+
+LEDGERS = (('cartridge_stock', 'cartridge'), ('printer_stock', 'printer'))
+
+
+def create_views():
+    for ledger, item in LEDGERS:
+        op.execute("CREATE VIEW {ledger} AS SELECT id, date, in_out, office, item_id AS {item}, amount, user_id "
+                   "FROM stock_movement WHERE item_type = '{item}'".format(ledger=ledger, item=item))
+
+
+def drop_views():
+    for ledger, item in LEDGERS:
+        op.execute('DROP VIEW {}'.format(ledger))
+
+
+def upgrade():
+    ledger_sequence = op.create_table('ledger_sequence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(ledger_sequence, [{'id': 1, 'generation': 1}])
+    op.add_column('stock_movement', sa.Column('sequence', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_stock_movement_sequence'), 'stock_movement', ['sequence'], unique=False)
+    # rows already written count as committed by the first sequence
+    op.execute('UPDATE stock_movement SET sequence = 1')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stock_movement_sequence'), table_name='stock_movement')
+    # SQLite rebuilds the table to drop a column, which the compatibility views would block
+    drop_views()
+    with op.batch_alter_table('stock_movement') as batch_op:
+        batch_op.drop_column('sequence')
+    create_views()
+    op.drop_table('ledger_sequence')
@@ -0,0 +1,126 @@
+"""stock movement
+
+Revision ID: a52d7c9e1b38
+Revises: 6e0c94a2d8f3
+Create Date: 2026-10-18 16:02:44.519307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a52d7c9e1b38'
+down_revision = '6e0c94a2d8f3'
+branch_labels = None
+depends_on = None
+
+LEDGERS = (('cartridge_stock', 'cartridge'), ('printer_stock', 'printer'))
+
+
+def max_id(bind, table):
+    return bind.execute('SELECT MAX(id) FROM {}'.format(table)).scalar() or 0
+
+
+def reset_sequences(bind, tables):
+    # explicit ids do not move a PostgreSQL serial forward
+    if bind.dialect.name == 'postgresql':
+        for table in tables:
+            op.execute("SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                       "COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)".format(table=table))
+
+
+def create_views():
+    # read-only stand-ins for the old tables, for reports and scripts that still query them
+    for ledger, item in LEDGERS:
+        op.execute("CREATE VIEW {ledger} AS SELECT id, date, in_out, office, item_id AS {item}, amount, user_id "
+                   "FROM stock_movement WHERE item_type = '{item}'".format(ledger=ledger, item=item))
+
+
+def drop_views():
+    for ledger, item in LEDGERS:
+        op.execute('DROP VIEW {}'.format(ledger))
+
+
+def upgrade():
+    op.create_table('stock_movement',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=True),
+    sa.Column('item_type', sa.String(length=20), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('in_out', sa.Boolean(), nullable=True),
+    sa.Column('office', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_movement_date'), 'stock_movement', ['date'], unique=False)
+    op.create_index('ix_stock_movement_item_in_out', 'stock_movement',
+                    ['item_type', 'item_id', 'in_out', 'office', 'amount'], unique=False)
+    op.create_index('ix_stock_movement_item_type_date', 'stock_movement', ['item_type', 'date'], unique=False)
+    op.create_index('ix_stock_movement_office_date', 'stock_movement', ['office', 'date'], unique=False)
+
+    # Cartridge movements keep their ids. Printer ids are moved past every id in use,
+    # archived rows included, so a later archive run into the same year cannot collide.
+    bind = op.get_bind()
+    archives = ['{}_{}'.format(ledger, year) for ledger, year in bind.execute('SELECT ledger, year FROM ledger_archive')]
+    offset = max([max_id(bind, table) for table in ['cartridge_stock', 'printer_stock'] + archives])
+    for ledger, item in LEDGERS:
+        op.execute(
+            'INSERT INTO stock_movement (id, date, item_type, item_id, in_out, office, amount, user_id) '
+            "SELECT id + {offset}, date, '{item}', {item}, in_out, office, amount, user_id FROM {ledger}".format(
+                ledger=ledger, item=item, offset=offset if item == 'printer' else 0)
+        )
+    reset_sequences(bind, ['stock_movement'])
+    op.drop_table('cartridge_stock')
+    op.drop_table('printer_stock')
+    create_views()
+
+
+def downgrade():
+    drop_views()
+    op.create_table('cartridge_stock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=True),
+    sa.Column('in_out', sa.Boolean(), nullable=True),
+    sa.Column('office', sa.Integer(), nullable=True),
+    sa.Column('cartridge', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['cartridge'], ['cartridge.id'], ),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cartridge_stock_date'), 'cartridge_stock', ['date'], unique=False)
+    op.create_index('ix_cartridge_stock_cartridge_in_out', 'cartridge_stock',
+                    ['cartridge', 'in_out', 'office', 'amount'], unique=False)
+    op.create_index('ix_cartridge_stock_office_date', 'cartridge_stock', ['office', 'date'], unique=False)
+    op.create_table('printer_stock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=True),
+    sa.Column('in_out', sa.Boolean(), nullable=True),
+    sa.Column('office', sa.Integer(), nullable=True),
+    sa.Column('printer', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.ForeignKeyConstraint(['printer'], ['printer.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_printer_stock_date'), 'printer_stock', ['date'], unique=False)
+    op.create_index('ix_printer_stock_printer_in_out', 'printer_stock',
+                    ['printer', 'in_out', 'office', 'amount'], unique=False)
+    op.create_index('ix_printer_stock_office_date', 'printer_stock', ['office', 'date'], unique=False)
+    # movement ids are unique across both ledgers, so every row can keep its id
+    for ledger, item in LEDGERS:
+        op.execute(
+            'INSERT INTO {ledger} (id, date, in_out, office, {item}, amount, user_id) '
+            "SELECT id, date, in_out, office, item_id, amount, user_id FROM stock_movement "
+            "WHERE item_type = '{item}'".format(ledger=ledger, item=item)
+        )
+    reset_sequences(op.get_bind(), [ledger for ledger, item in LEDGERS])
+    op.drop_table('stock_movement')
@@ -0,0 +1,45 @@
+"""ledger indexes
+
+Revision ID: b93d7f15c6e0
+Revises: 4a8c2e6f0b91
+Create Date: 2026-10-18 14:37:51.208416
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b93d7f15c6e0'
+down_revision = '4a8c2e6f0b91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # left over from the first schema, d447d6510b87 never managed to drop it
+    inspector = sa.inspect(op.get_bind())
+    if 'printer' in [column['name'] for column in inspector.get_columns('cartridge_stock')]:
+        foreign_keys = [key['name'] for key in inspector.get_foreign_keys('cartridge_stock')
+                        if key['constrained_columns'] == ['printer'] and key['name']]
+        with op.batch_alter_table('cartridge_stock') as batch_op:
+            for name in foreign_keys:
+                batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.drop_column('printer')
+    op.drop_index('ix_cartridge_stock_amount', table_name='cartridge_stock')
+    op.drop_index('ix_printer_stock_amount', table_name='printer_stock')
+    op.create_index('ix_cartridge_stock_cartridge_in_out', 'cartridge_stock',
+                    ['cartridge', 'in_out', 'office', 'amount'], unique=False)
+    op.create_index('ix_cartridge_stock_office_date', 'cartridge_stock', ['office', 'date'], unique=False)
+    op.create_index('ix_printer_stock_printer_in_out', 'printer_stock',
+                    ['printer', 'in_out', 'office', 'amount'], unique=False)
+    op.create_index('ix_printer_stock_office_date', 'printer_stock', ['office', 'date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_printer_stock_office_date', table_name='printer_stock')
+    op.drop_index('ix_printer_stock_printer_in_out', table_name='printer_stock')
+    op.drop_index('ix_cartridge_stock_office_date', table_name='cartridge_stock')
+    op.drop_index('ix_cartridge_stock_cartridge_in_out', table_name='cartridge_stock')
+    op.create_index('ix_printer_stock_amount', 'printer_stock', ['amount'], unique=False)
+    op.create_index('ix_cartridge_stock_amount', 'cartridge_stock', ['amount'], unique=False)
@@ -0,0 +1,57 @@
+"""balance snapshots
+
+Revision ID: c3f90a6d1e58
+Revises: 8d41c7e2a9b0
+Create Date: 2026-10-18 11:40:52.731094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f90a6d1e58'
+down_revision = '8d41c7e2a9b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_checkpoint',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_checkpoint_date'), 'stock_checkpoint', ['date'], unique=True)
+    op.create_table('cartridge_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('checkpoint', sa.Integer(), nullable=False),
+    sa.Column('cartridge', sa.Integer(), nullable=False),
+    sa.Column('office', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['cartridge'], ['cartridge.id'], ),
+    sa.ForeignKeyConstraint(['checkpoint'], ['stock_checkpoint.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('checkpoint', 'cartridge', 'office', name='uq_cartridge_snapshot_checkpoint_cartridge_office')
+    )
+    op.create_table('printer_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('checkpoint', sa.Integer(), nullable=False),
+    sa.Column('printer', sa.Integer(), nullable=False),
+    sa.Column('office', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['checkpoint'], ['stock_checkpoint.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['office'], ['office.id'], ),
+    sa.ForeignKeyConstraint(['printer'], ['printer.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('checkpoint', 'printer', 'office', name='uq_printer_snapshot_checkpoint_printer_office')
+    )
+
+
+def downgrade():
+    op.drop_table('printer_snapshot')
+    op.drop_table('cartridge_snapshot')
+    op.drop_index(op.f('ix_stock_checkpoint_date'), table_name='stock_checkpoint')
+    op.drop_table('stock_checkpoint')
@@ -32,15 +32,11 @@ def upgrade():
     sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
     sa.PrimaryKeyConstraint('id')
     )
-    op.drop_constraint(None, 'cartridge_stock', type_='foreignkey')
-    op.drop_column('cartridge_stock', 'printer')
     # ### end Alembic commands ###
 
 
 def downgrade():
     # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('cartridge_stock', sa.Column('printer', sa.INTEGER(), nullable=True))
-    op.create_foreign_key(None, 'cartridge_stock', 'printer', ['printer'], ['id'])
     op.drop_table('user_roles')
     op.drop_table('roles')
     # ### end Alembic commands ###
@@ -0,0 +1,29 @@
+"""ledger version
+
+Revision ID: e7a25b9f3c14
+Revises: c3f90a6d1e58
+Create Date: 2026-10-18 12:26:09.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a25b9f3c14'
+down_revision = 'c3f90a6d1e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    ledger_version = op.create_table('ledger_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(ledger_version, [{'id': 1, 'generation': 0}])
+
+
+def downgrade():
+    op.drop_table('ledger_version')
@@ -0,0 +1,84 @@
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+import pytest
+from werkzeug.http import http_date
+from app import create_app, db, analytics, catalog, dashboard
+from app.models import User, Role, Cartridge, Printer, Office, CartridgeStock, role_cache
+from app.stock import Movement, write_movements
+from config import TestingConfig
+
+Stock = namedtuple('Stock', 'warehouse office cartridges printer')
+
+
+def database_config(path, read_path=None):
+    # a file database, so requests and threads share it the way workers do, and
+    # optionally a second file standing in for a replica
+    class FileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(path)
+        SQLALCHEMY_BINDS = {'read': 'sqlite:///' + str(read_path)} if read_path else {}
+    return FileConfig
+
+
+def reset_caches():
+    # the process caches are keyed by generations that start over in every test database
+    catalog._cache = {'generation': None, 'catalogs': {}}
+    dashboard._cache = {'state': None, 'fragments': OrderedDict()}
+    analytics._state = {'revision': None, 'last_sequence': 0, 'daily': None}
+    role_cache.invalidate()
+
+
+@pytest.fixture
+def app(tmp_path):
+    # no context is kept pushed: every request gets its own, with a fresh g
+    reset_caches()
+    app = create_app(database_config(tmp_path / 'it_store.db'))
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(username='bob', email='bob@example.com', roles=[Role(name='Admin'), Role(name='User')])
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def stock(app, user):
+    # 10 CE285 in the warehouse, and an office whose printer takes CE285 and CF283
+    with app.app_context():
+        warehouse, office = Office(name='Warehouse', place='Basement'), Office(name='Office 1', place='Floor 1')
+        cartridges = [Cartridge(cartridge_model='CE285', color='Black'), Cartridge(cartridge_model='CF283', color='Black')]
+        printer = Printer(brand='HP', printer_model='P1102', cartridges=cartridges)
+        office.printers.append(printer)
+        db.session.add_all([warehouse, office, printer])
+        db.session.commit()
+        assert warehouse.id == app.config['WAREHOUSE_OFFICE_ID']
+        write_movements([(0, Movement(CartridgeStock, cartridges[0].id, warehouse.id, True, 10))], user)
+        return Stock(warehouse.id, office.id, [cartridge.id for cartridge in cartridges], printer.id)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, username='bob', password='secret'):
+    return client.post('/login', data={'username': username, 'password': password})
+
+
+def tomorrow():
+    return http_date(datetime.now() + timedelta(days=1))
+
+
+def assert_revalidates(client, url):
+    # the ETag alone answers a repeated request with a 304
+    first = client.get(url)
+    assert first.status_code == 200
+    assert 'Last-Modified' not in first.headers
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    return first
@@ -0,0 +1,25 @@
+from app import db
+from app.models import CartridgeStock, CartridgeBalance
+from app.stock import Movement, write_movements, verify_balances, stock_on_hand
+from conftest import login
+
+
+def test_editing_the_cartridge_of_a_movement_moves_its_stock(app, client, stock, user):
+    first, second = stock.cartridges
+    with app.app_context():
+        write_movements([(0, Movement(CartridgeStock, second, stock.warehouse, True, 5)),
+                         (1, Movement(CartridgeStock, first, stock.office, False, 3))], user)
+        issue = CartridgeStock.query.filter_by(in_out=False).one()
+        id, date, sequence = issue.id, issue.date, issue.sequence
+    login(client)
+    # the ledger sequence is not a form field, a posted one is ignored
+    response = client.post('/admin/cartridgestock/edit/?id={}'.format(id), data={
+        'cartridge': second, 'date': date.strftime('%Y-%m-%d %H:%M:%S'), 'amount': 3, 'user': user,
+        'sequence': sequence + 100})
+    assert response.status_code == 302
+    with app.app_context():
+        issue = CartridgeStock.query.get(id)
+        assert (issue.item_id, issue.sequence) == (second, sequence)
+        assert verify_balances() == []
+        assert stock_on_hand(CartridgeBalance, first) == 10
+        assert stock_on_hand(CartridgeBalance, second) == 2
@@ -0,0 +1,60 @@
+import gzip
+import json
+from app import db
+from app.models import CartridgeStock
+from app.stock import Movement, write_movements
+from conftest import assert_revalidates, login, tomorrow
+
+
+def test_v1_revalidates_on_the_etag_alone(app, client, stock):
+    login(client)
+    for url in ('/api/v1/balances/cartridge_stock', '/api/v1/ledger/cartridge_stock'):
+        assert_revalidates(client, url)
+
+    with app.app_context():
+        CartridgeStock.query.one().amount = 7
+        db.session.commit()
+    balances = client.get('/api/v1/balances/cartridge_stock', headers={'If-Modified-Since': tomorrow()})
+    assert balances.status_code == 200
+    assert balances.get_json() == {'v': 1, 'ledger': 'cartridge_stock', 'office': stock.warehouse,
+                                   'fields': ['id', 'model', 'amount', 'level'],
+                                   'rows': [[stock.cartridges[0], 'CE285', 7, 'low'],
+                                            [stock.cartridges[1], 'CF283', 0, 'critical']]}
+    assert client.get('/api/v1/ledger/cartridge_stock', headers={'If-Modified-Since': tomorrow()}).status_code == 200
+
+
+def test_v1_gzips_only_for_clients_that_accept_it(app, client, stock):
+    app.config['API_GZIP_MIN_SIZE'] = 0
+    login(client)
+    url = '/api/v1/balances/cartridge_stock'
+    plain = client.get(url)
+    packed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(packed.data)) == plain.get_json()
+    assert 'Accept-Encoding' in packed.headers['Vary']
+    # each encoding is its own representation, with its own tag
+    assert packed.headers['ETag'] != plain.headers['ETag']
+    app.config['API_GZIP_MIN_SIZE'] = 1 << 20
+    assert 'Content-Encoding' not in client.get(url, headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_v1_ledger_pages_are_compact_and_disjoint(app, client, stock, user):
+    with app.app_context():
+        write_movements([(index, Movement(CartridgeStock, stock.cartridges[0], stock.office, False, 1))
+                         for index in range(4)], user)
+        ids = [id for id, in db.session.query(CartridgeStock.id).order_by(CartridgeStock.id.desc())]
+    login(client)
+    first = client.get('/api/v1/ledger/cartridge_stock?limit=2').get_json()
+    assert first['fields'] == ['id', 'date', 'office', 'item', 'in_out', 'amount']
+    id, issued_at, office, item, in_out, amount = first['rows'][0]
+    assert (id, office, item, in_out, amount) == (ids[0], stock.office, stock.cartridges[0], 0, 1)
+    assert len(issued_at) == 14 and issued_at.isdigit()
+    assert first['offices'] == {str(stock.office): 'Office 1 at Floor 1'}
+    assert first['items'] == {str(stock.cartridges[0]): 'CE285'}
+
+    second = client.get('/api/v1/ledger/cartridge_stock?limit=2&after={}'.format(first['next'])).get_json()
+    third = client.get('/api/v1/ledger/cartridge_stock?limit=2&after={}'.format(second['next'])).get_json()
+    pages = [[row[0] for row in page['rows']] for page in (first, second, third)]
+    assert pages == [ids[:2], ids[2:4], ids[4:]]
+    assert third['next'] is None
@@ -0,0 +1,32 @@
+from datetime import date, datetime
+from app import db
+from app.archive import archive_ledgers
+from app.models import CartridgeStock
+from app.snapshots import balances_as_of
+from app.stock import archived_years, verify_balances
+
+DAYS = (date(2022, 12, 31), date(2023, 3, 1), date(2023, 12, 31), date(2024, 1, 1), date(2024, 6, 30), date.today())
+
+
+def balances(day):
+    return {key: amount for key, amount in balances_as_of(CartridgeStock, day).items() if amount}
+
+
+def test_archiving_a_year_keeps_every_balance(app, stock):
+    with app.app_context():
+        cartridge = stock.cartridges[1]
+        movements = [(datetime(2023, 2, 1), True, stock.warehouse, 20), (datetime(2023, 5, 1), False, stock.office, 6),
+                     (datetime(2023, 12, 31, 23, 59), False, stock.office, 4),
+                     (datetime(2024, 1, 1), True, stock.warehouse, 5), (datetime(2024, 3, 1), False, stock.office, 2)]
+        db.session.add_all([CartridgeStock(date=when, in_out=in_out, office=office, cartridge=cartridge, amount=amount)
+                            for when, in_out, office, amount in movements])
+        db.session.commit()
+        before = {day: balances(day) for day in DAYS}
+
+        moved = archive_ledgers(datetime(2024, 1, 1))
+        assert moved['cartridge_stock'] == 3
+        assert archived_years(CartridgeStock) == [2023]
+        assert CartridgeStock.query.filter(CartridgeStock.date < datetime(2024, 1, 1)).count() == 0
+        assert verify_balances() == []
+        assert {day: balances(day) for day in DAYS} == before
+        assert before[date(2023, 12, 31)][(cartridge, stock.warehouse)] == 10
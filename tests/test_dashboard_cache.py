@@ -0,0 +1,31 @@
+from app import db
+from app.models import CartridgeStock
+from conftest import assert_revalidates, login, tomorrow
+
+
+def test_ledger_edit_is_not_hidden_by_a_304(app, client, stock):
+    first = assert_revalidates(client, '/')
+    with app.app_context():
+        CartridgeStock.query.one().amount = 7
+        db.session.commit()
+    assert client.get('/', headers={'If-Modified-Since': tomorrow()}).status_code == 200
+    assert client.get('/', headers={'If-None-Match': first.headers['ETag'],
+                                    'If-Modified-Since': tomorrow()}).status_code == 200
+
+
+def test_stock_write_replaces_the_cached_fragments(app, client, stock):
+    login(client)
+    # a page showing flashed messages is never cached, so the login message is read first
+    client.get('/')
+    first = assert_revalidates(client, '/')
+    assert 'data-balance="{}">10<'.format(stock.cartridges[0]) in first.data.decode()
+    client.post('/cartridgestock', data={'office': stock.office, 'cartridge': stock.cartridges[0],
+                                         'in_out': 'False', 'amount': 3}, follow_redirects=True)
+    with app.app_context():
+        issued = db.session.query(db.func.max(CartridgeStock.id)).scalar()
+    second = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    html = second.data.decode()
+    assert 'data-id="{}"'.format(issued) in html
+    assert 'data-balance="{}">7<'.format(stock.cartridges[0]) in html
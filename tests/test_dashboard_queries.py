@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Cartridge, Printer, Office, StockMovement
+from app.stock import rebuild_balances
+from conftest import database_config, reset_caches
+
+
+def seed(size):
+    db.session.execute(Office.__table__.insert(), [{'id': id, 'name': 'Office {}'.format(id), 'place': 'Floor 1'}
+                                                   for id in range(1, size + 1)])
+    db.session.execute(Cartridge.__table__.insert(), [{'id': id, 'cartridge_model': 'CRT-{}'.format(id),
+                                                       'color': 'Black'} for id in range(1, size + 1)])
+    db.session.execute(Printer.__table__.insert(), [{'id': id, 'brand': 'HP', 'printer_model': 'PRN-{}'.format(id)}
+                                                    for id in range(1, size + 1)])
+    start = datetime(2024, 1, 1)
+    db.session.execute(StockMovement.__table__.insert(), [
+        {'date': start + timedelta(hours=number), 'item_type': item_type, 'item_id': number % size + 1,
+         'office': number % size + 1, 'in_out': number % 3 == 0, 'amount': 1}
+        for item_type in ('cartridge', 'printer') for number in range(size * 10)])
+    db.session.commit()
+    rebuild_balances()
+
+
+def dashboard_queries(tmp_path, size):
+    reset_caches()
+    app = create_app(database_config(tmp_path / 'dashboard_{}.db'.format(size)))
+    with app.app_context():
+        db.create_all()
+        seed(size)
+        engine = db.engine
+    queries = []
+
+    def count(*args):
+        queries.append(args[2])
+    event.listen(engine, 'after_cursor_execute', count)
+    try:
+        response = app.test_client().get('/')
+    finally:
+        event.remove(engine, 'after_cursor_execute', count)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def test_dashboard_query_count_does_not_grow_with_data(tmp_path):
+    assert dashboard_queries(tmp_path, 10) == dashboard_queries(tmp_path, 100)
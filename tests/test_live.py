@@ -0,0 +1,46 @@
+from datetime import date, datetime
+from app import db
+from app.analytics import daily_issues
+from app.dashboard import dashboard_state
+from app.live import live_feed, movement_batch
+from app.models import Cartridge, Office, CartridgeStock
+
+
+def issue(id, cartridge, office, user_id):
+    db.session.add(CartridgeStock(id=id, date=datetime.now(), in_out=False, office=office,
+                                  cartridge=cartridge, amount=1, user_id=user_id))
+    db.session.commit()
+
+
+def test_a_row_committed_late_with_a_lower_id_is_still_read(app, user):
+    # ids are handed out at insert, not at commit: on a server database the row with
+    # the lower id can become visible after a newer one
+    with app.app_context():
+        cartridge, office = Cartridge(cartridge_model='CE285', color='Black'), Office(name='Office 1', place='Floor 1')
+        db.session.add_all([cartridge, office])
+        db.session.commit()
+        issue(1000, cartridge.id, office.id, user)
+        seen = dashboard_state().high_water
+        assert sum(daily_issues(date.today())[(office.id, cartridge.id)].values()) == 1
+
+        issue(500, cartridge.id, office.id, user)
+        state = dashboard_state()
+        assert state.high_water > seen
+        assert [row[0] for row in movement_batch(seen, state.high_water)['rows']] == [500]
+        assert sum(daily_issues(date.today())[(office.id, cartridge.id)].values()) == 2
+
+
+def test_closed_streams_leave_no_subscriber_behind(app, client):
+    app.config.update(LIVE_KEEPALIVE_SECONDS=0.1, LIVE_POLL_SECONDS=0.05)
+    # gone right after the retry hint, before it subscribed
+    response = client.get('/events', buffered=False)
+    assert next(iter(response.response)) == b'retry: 3000\n\n'
+    response.close()
+    assert live_feed._subscribers == 0
+    # gone while waiting for batches
+    response = client.get('/events', buffered=False)
+    chunks = iter(response.response)
+    assert [next(chunks), next(chunks)] == [b'retry: 3000\n\n', b': keepalive\n\n']
+    assert live_feed._subscribers == 1
+    response.close()
+    assert live_feed._subscribers == 0
@@ -0,0 +1,61 @@
+import re
+from datetime import date, datetime, timedelta
+import pytest
+from app import db
+from app.models import StockMovement
+from app.ledger import LEDGER_TABLES, ledger_page_query, movements_page_query, encode_cursor
+from app.stock import ledger_totals_query
+
+
+def hot_queries():
+    # The ledger reads behind the dashboard, exports, snapshots and balance checks,
+    # each with the filter columns its index has to seek on.
+    today = date.today()
+    month = {'date_from': today - timedelta(days=30), 'date_to': today}
+    cursor = encode_cursor(type('Row', (), {'date': datetime.combine(today, datetime.min.time()), 'id': 1000}))
+    for table, model in sorted(LEDGER_TABLES.items()):
+        yield '{} page'.format(table), ledger_page_query(model), {'item_type'}
+        yield '{} next page'.format(table), ledger_page_query(model, cursor), {'item_type'}
+        yield '{} page of an office'.format(table), ledger_page_query(model, office=2), {'office'}
+        yield '{} page of an item'.format(table), ledger_page_query(model, item=1), {'item_type', 'item_id'}
+        yield '{} page of a month'.format(table), ledger_page_query(model, **month), {'item_type', 'date'}
+        yield '{} totals'.format(table), ledger_totals_query(model), {'item_type'}
+        yield '{} totals of a month'.format(table), ledger_totals_query(model, *month.values()), {'item_type', 'date'}
+    yield 'movements of an office in a month', movements_page_query(office=2, **month), {'office', 'date'}
+
+
+def query_plan(query):
+    connection = db.session.connection()
+    compiled = query.statement.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    return [row[-1] for row in connection.execute('EXPLAIN QUERY PLAN ' + str(compiled), params)]
+
+
+def sought_columns(plan):
+    # "SEARCH stock_movement USING INDEX ix (item_type=? AND date>?)": the columns the index seeks on
+    columns = set()
+    for detail in plan:
+        words = detail.split()
+        if words[0] == 'SEARCH' and StockMovement.__tablename__ in words and '(' in detail:
+            columns |= set(re.findall(r'(\w+)[=<>]', detail[detail.index('('):]))
+    return columns
+
+
+def full_scans(plan):
+    # "SCAN stock_movement" reads every row, "SCAN ... USING (COVERING) INDEX" walks an index
+    return [detail for detail in plan if detail.split()[0] == 'SCAN' and 'INDEX' not in detail
+            and StockMovement.__tablename__ in detail.split()]
+
+
+def test_hot_ledger_queries_seek_on_their_filters(app):
+    with app.app_context():
+        if db.session.connection().dialect.name != 'sqlite':
+            pytest.skip('query plans are only checked on SQLite')
+        failures = []
+        for name, query, columns in hot_queries():
+            plan = query_plan(query)
+            missing = columns - sought_columns(plan)
+            if full_scans(plan) or missing:
+                failures.append('{}: no index seek on {}\n    {}'.format(
+                    name, ', '.join(sorted(missing)) or 'the table', '\n    '.join(plan)))
+        assert not failures, '\n'.join(failures)
@@ -0,0 +1,41 @@
+from sqlalchemy import event
+from app import db
+from app.models import User, UserRoles, RoleVersion
+from conftest import login
+
+
+def test_revoked_role_is_seen_before_the_cache_expires(app, client, user):
+    login(client)
+    assert client.get('/admin/').status_code == 200
+    # another worker revokes the role: its flush bumps the shared generation
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(UserRoles.__table__.delete())
+        connection.execute(RoleVersion.__table__.update().values(generation=RoleVersion.__table__.c.generation + 1))
+    assert client.get('/admin/').status_code == 302
+
+
+def test_role_edits_bump_the_generation(app, user):
+    with app.app_context():
+        generation = db.session.query(RoleVersion.generation).scalar()
+        user = User.query.get(user)
+        user.roles = user.roles[:1]
+        db.session.commit()
+        assert db.session.query(RoleVersion.generation).scalar() == generation + 1
+
+
+def test_role_checks_add_no_query_to_a_request(app, client, user):
+    login(client)
+    client.get('/admin/')
+    with app.app_context():
+        engine = db.engine
+    queries = []
+
+    def record(*args):
+        queries.append(args[2])
+    event.listen(engine, 'after_cursor_execute', record)
+    try:
+        assert client.get('/admin/').status_code == 200
+    finally:
+        event.remove(engine, 'after_cursor_execute', record)
+    # the generation is a column of the user load, the role names come from the cache
+    assert [query for query in queries if 'role_version' in query or 'roles' in query] == [queries[0]]
@@ -0,0 +1,58 @@
+import threading
+from app import db
+from app.models import Cartridge, Printer, Office, CartridgeStock, CartridgeBalance
+from app.stock import Movement, write_movements, verify_balances, stock_on_hand
+
+THREADS = 8
+ISSUES_PER_THREAD = 15
+RECEIVED = 40
+
+
+def stock(app, user_id):
+    warehouse = Office(name='Warehouse', place='Basement')
+    cartridges = [Cartridge(cartridge_model='CE285', color='Black'), Cartridge(cartridge_model='CF283', color='Black')]
+    offices = [Office(name='Office {}'.format(number), place='Floor 1') for number in range(3)]
+    printer = Printer(brand='HP', printer_model='P1102', cartridges=cartridges)
+    for office in offices:
+        office.printers.append(printer)
+    db.session.add_all([warehouse, printer] + offices)
+    db.session.commit()
+    assert warehouse.id == app.config['WAREHOUSE_OFFICE_ID']
+    write_movements([(0, Movement(CartridgeStock, cartridges[0].id, warehouse.id, True, RECEIVED))], user_id)
+    return [cartridge.id for cartridge in cartridges], [office.id for office in offices]
+
+
+def test_concurrent_issues_never_overdraw_the_warehouse(app, user):
+    with app.app_context():
+        (issued, received), offices = stock(app, user)
+    warehouse = app.config['WAREHOUSE_OFFICE_ID']
+    results, errors = [], []
+
+    def issue(number):
+        # every thread writes its own movements, the last one receives a never stocked item
+        try:
+            with app.app_context():
+                for step in range(ISSUES_PER_THREAD):
+                    if number == THREADS - 1:
+                        movement = Movement(CartridgeStock, received, warehouse, True, 1)
+                    else:
+                        movement = Movement(CartridgeStock, issued, offices[(number + step) % len(offices)], False, 1)
+                    results.extend(write_movements([(0, movement)], user))
+                db.session.remove()
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=issue, args=(number,)) for number in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(results) == THREADS * ISSUES_PER_THREAD
+    with app.app_context():
+        assert verify_balances() == []
+        assert db.session.query(CartridgeBalance).filter(CartridgeBalance.amount < 0).count() == 0
+        # an issue has to leave at least one item behind
+        written = sum(result['status'] == 'ok' for result in results) - ISSUES_PER_THREAD
+        assert stock_on_hand(CartridgeBalance, issued) == RECEIVED - written >= 1
+        assert stock_on_hand(CartridgeBalance, received) == ISSUES_PER_THREAD